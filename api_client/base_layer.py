@@ -1,14 +1,13 @@
 import json
 import os
-import requests
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Iterator
+from transport import http_client
 
 ''' Additional features to be added if useful:
 https://www.pricerunner.dk/dk/api/search-compare-gateway/public/content/da-DK/home/home-DK ###
 https://www.pricerunner.dk/dk/api/search-compare-gateway/public/template/home/DK
 https://www.pricerunner.dk/dk/api/search-compare-gateway/public/navigation/menu/DK/items
 https://www.pricerunner.dk/dk/api/search-compare-gateway/public/template/treepage/DK?url=https%3A%2F%2Fwww.pricerunner.dk%2Ft%2F1493%2FLegetoej-Hobby
-https://www.pricerunner.dk/dk/api/search-compare-gateway/public/search/deals/products/v3/DK?ids=PRICE_DROP,PRICE,CATEGORY,MERCHANT_DEAL,BRAND&af_PRICE_DROP=-90_-10&size=10
 https://www.pricerunner.dk/dk/api/search-compare-gateway/public/cms?contentType=treePageExtraContent&id=t1493&language=da
 https://www.pricerunner.dk/dk/api/search-compare-gateway/public/productinfo/DK?productIds=3205665051,3200338672&withShipping=false
 https://www.pricerunner.dk/dk/api/search-compare-gateway/public/search/board/DK/507/?size=4
@@ -26,13 +25,22 @@ https://www.pricerunner.dk/dk/api/search-compare-gateway/public/pricehistory/pro
 '''
 
 BASE_API_URL = 'https://www.pricerunner.dk/dk/api/search-compare-gateway/public'
+CATEGORIES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'categories.json')
+
+
+class IncompleteListing(Exception):
+    '''A page fetch failed before totalProductHits was reached, so the listing is truncated.'''
+
+    def __init__(self, subcategory_id: str, offset: int, total: Optional[int]):
+        super().__init__(f"Listing {subcategory_id} stopped at offset {offset} of {total if total is not None else 'unknown'}")
+        self.subcategory_id = subcategory_id
+        self.offset = offset
+        self.total = total
 
 def fetch_json(url: str) -> Optional[Dict[str, Any]]:
     try:
-        response = requests.get(url)
-        response.raise_for_status()  
-        return response.json()
-    except requests.RequestException as e:
+        return json.loads(http_client.fetch(url))
+    except (http_client.RequestException, ValueError) as e:
         print(f"Exception: {e}")
         return None
     
@@ -65,6 +73,30 @@ def get_products(subcategory_id: str, size: int = 10, filters: str = "", additio
     size_param = f"&size={size}" if size else ""
     return fetch_json(f"{BASE_API_URL}/search/category/v3/DK/{subcategory_id}?{filters}{size_param}{additional_params}")
 
+def iter_product_pages(subcategory_id: str, page_size: int = 100, filters: str = "", additional_params: str = "", offset: int = 0) -> Iterator[Dict[str, Any]]:
+    '''
+    Yields every search/category/v3 page of a subcategory, starting at offset. Raises
+    IncompleteListing if a page cannot be fetched, so a failure is never mistaken for the end.
+    '''
+    total = None
+    while True:
+        data = get_products(subcategory_id, page_size, filters, f"{additional_params}&offset={offset}")
+        if data is None:
+            raise IncompleteListing(subcategory_id, offset, total)
+        products = data.get("products", [])
+        if not products:
+            return
+        yield data
+        offset += len(products)
+        total = data.get("totalProductHits", 0)
+        if offset >= total:
+            return
+
+def get_deals(size: int = 10, price_drop: str = "-90_-10", filters: str = "", additional_params: str = "", facets: str = "PRICE_DROP,PRICE,CATEGORY,MERCHANT_DEAL,BRAND") -> Optional[Dict[str, Any]]:
+    '''Products with a price drop; price_drop "-90_-10" = 10-90% discount. filters and additional_params are extra "k=v&k=v" query parts.'''
+    parts = [f"ids={facets}", f"af_PRICE_DROP={price_drop}", f"size={size}"] + filters.split('&') + additional_params.split('&')
+    return fetch_json(f"{BASE_API_URL}/search/deals/products/v3/DK?" + "&".join(part for part in parts if part))
+
 def get_filters(subcategory_id: str) -> Optional[Dict[str, Any]]:
     return fetch_json(f"{BASE_API_URL}/search/category/filters/DK/{subcategory_id}?showAll=true")
 
@@ -114,7 +146,14 @@ def list_products(product_ids: List[str]) -> Optional[Dict[str, Any]]:
 def get_product_reviews(product_id: str, count: int = 4) -> Optional[Dict[str, Any]]:
     return fetch_json(f"{BASE_API_URL}/reviews/products/overview/DK/{product_id}?count={count}")
 
-def get_main_categories_from_json(json_file: str = 'categories.json'):
+def get_main_category_ids(json_file: str = CATEGORIES_FILE) -> List[str]:
+    '''Ids of the main categories; raises ValueError if the file is missing, unreadable or empty.'''
+    data = get_main_categories_from_json(json_file)
+    if not data:
+        raise ValueError(f"No main categories could be read from '{json_file}'.")
+    return [category["id"] for category in data]
+
+def get_main_categories_from_json(json_file: str = CATEGORIES_FILE):
     if not os.path.exists(json_file):
         print(f"Error: The file '{json_file}' does not exist.")
         return None
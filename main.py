@@ -1,6 +1,150 @@
-from api_client.base_layer import *
+'''
+Batch query runner. Reads one JSON job per line and streams one NDJSON result per job as it completes.
 
-subCategory = SubCategory(id='cl40')
+Jobs:
+{"type": "products", "subcategory": "cl40", "filters": "af_BRAND=509", "size": 10, "params": "&sorting=PRICE_asc"}
+{"type": "product", "id": "3205665051"}
+{"type": "search", "query": "ryzen", "size": 10}
 
-products = subCategory.get_products(query='af_BRAND=509&size=1')
-print(json.dumps(products, indent=4))
\ No newline at end of file
+Example:
+python main.py jobs.ndjson --workers 8 --rate 5 > results.ndjson
+'''
+import argparse
+import json
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Optional, Dict, Any, Iterator, TextIO, Tuple
+from api_client.base_layer import get_products, get_product_rank, get_product_details, search
+from transport import http_client
+
+
+def run_products(job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    return get_products(job["subcategory"].replace('cl', ''), job.get("size", 10), job.get("filters", ""), job.get("params", ""))
+
+
+def run_product(job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    subcategory = job.get("subcategory")
+    if not subcategory:
+        rank = get_product_rank(job["id"]) or {}
+        match = re.search(r'cl/(\d+)/', rank.get("url") or '')
+        if not match:
+            return None
+        subcategory = match.group(1)
+    return get_product_details(subcategory.replace('cl', ''), job["id"])
+
+
+def run_search(job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    return search(job["query"], job.get("size", 10))
+
+
+JOB_TYPES = {'products': run_products, 'product': run_product, 'search': run_search}
+
+
+def read_jobs(source: TextIO) -> Iterator[Tuple[int, Any, Optional[str]]]:
+    '''(line number, job, parse error); a line that is not a JSON object yields its raw text or value with an error.'''
+    for number, line in enumerate(source, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            job = json.loads(line)
+        except ValueError as e:
+            yield number, line, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(job, dict):
+            yield number, job, f"A job must be a JSON object, got {type(job).__name__}"
+            continue
+        yield number, job, None
+
+
+def run_job(number: int, job: Any, error: Optional[str] = None) -> Dict[str, Any]:
+    started = time.perf_counter()
+    result = None
+    if error is None:
+        try:
+            runner = JOB_TYPES.get(job.get("type"))
+            if runner is None:
+                raise ValueError(f"Unknown job type '{job.get('type')}'. Use one of {sorted(JOB_TYPES)}.")
+            result = runner(job)
+            error = None if result is not None else "upstream request failed"
+        except (KeyError, ValueError, TypeError, AttributeError) as e:
+            result, error = None, f"{type(e).__name__}: {e}"
+    return {"line": number, "job": job, "ok": error is None, "error": error, "elapsed": round(time.perf_counter() - started, 4), "result": result}
+
+
+class Progress:
+    '''Periodic progress and throughput line on stderr.'''
+
+    def __init__(self, interval: float = 2.0, stream: TextIO = sys.stderr):
+        self.interval = interval
+        self.stream = stream
+        self.started = time.perf_counter()
+        self.last_report = self.started
+        self.done = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def add(self, ok: bool):
+        with self._lock:
+            self.done += 1
+            self.failed += not ok
+            now = time.perf_counter()
+            if now - self.last_report >= self.interval:
+                self.last_report = now
+                self.report()
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        print(f"{self.done} jobs done, {self.failed} failed, {elapsed:.1f}s, {self.done / elapsed if elapsed else 0:.1f} jobs/s", file=self.stream)
+
+
+def run_batch(source: TextIO, output: TextIO, workers: int = 8, progress: Optional[Progress] = None) -> Progress:
+    '''Runs jobs with at most `workers` in flight, reading ahead only as far as needed to keep them busy.'''
+    progress = progress or Progress()
+    jobs = read_jobs(source)
+    pending = set()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < workers * 2:
+                job = next(jobs, None)
+                if job is None:
+                    exhausted = True
+                else:
+                    pending.add(executor.submit(run_job, *job))
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                record = future.result()
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                output.flush()
+                progress.add(record["ok"])
+    progress.report()
+    return progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many PriceRunner queries concurrently and stream NDJSON results.")
+    parser.add_argument("jobs", nargs='?', default='-', help="NDJSON job file, '-' for stdin")
+    parser.add_argument("--output", default='-', help="NDJSON result file, '-' for stdout")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=5, help="Shared upstream requests per second (0 for no limit)")
+    parser.add_argument("--burst", type=int, default=5)
+    args = parser.parse_args()
+
+    http_client.set_rate_limit(args.rate, args.burst)
+    source = sys.stdin if args.jobs == '-' else open(args.jobs, 'r', encoding='utf-8')
+    output = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        run_batch(source, output, args.workers)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import json
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from typing import Optional, Dict, Any, List, Iterable, Iterator, Tuple, Union
+from models.product import Product, ProductsData
+
+Payload = Union[bytes, str]
+
+# (column name, array typecode or 's' for utf-8 strings, path into the listing product dict)
+PRODUCT_COLUMNS = [
+    ('id', 's', ('id',)),
+    ('name', 's', ('name',)),
+    ('url', 's', ('url',)),
+    ('classification', 's', ('classification',)),
+    ('lowestPrice', 'd', ('lowestPrice', 'amount')),
+    ('currency', 's', ('lowestPrice', 'currency')),
+    ('brandId', 's', ('brand', 'id')),
+    ('brandName', 's', ('brand', 'name')),
+    ('rank', 'q', ('rank', 'rank')),
+    ('ratingAverage', 'd', ('rating', 'average')),
+    ('ratingCount', 'q', ('rating', 'count')),
+    ('cheapestMerchantId', 's', ('cheapestOffer', 'merchant', 'id')),
+    ('cheapestMerchantName', 's', ('cheapestOffer', 'merchant', 'name')),
+    ('merchantCount', 'q', ('previewMerchants', 'count')),
+]
+
+
+def _lookup(data: Any, path: Tuple[str, ...]) -> Any:
+    for key in path:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+class ProductColumns:
+    '''
+    Column-oriented listing products. Numeric columns are arrays ('d' uses NaN for missing
+    values), string columns are one utf-8 buffer plus an array('q') of row offsets.
+    Every column also has a validity bytearray (1 = present).
+    '''
+
+    def __init__(self):
+        self.length = 0
+        self.numeric: Dict[str, array] = {}
+        self.strings: Dict[str, Tuple[bytearray, array]] = {}
+        self.valid: Dict[str, bytearray] = {}
+        for name, typecode, _ in PRODUCT_COLUMNS:
+            if typecode == 's':
+                self.strings[name] = (bytearray(), array('q', [0]))
+            else:
+                self.numeric[name] = array(typecode)
+            self.valid[name] = bytearray()
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __str__(self):
+        return f"ProductColumns(rows={self.length}, columns={len(PRODUCT_COLUMNS)})"
+
+    def append(self, product: Dict[str, Any]):
+        for name, typecode, path in PRODUCT_COLUMNS:
+            value = _lookup(product, path)
+            present = value is not None
+            if typecode == 's':
+                buffer, offsets = self.strings[name]
+                if present:
+                    buffer += str(value).encode('utf-8')
+                offsets.append(len(buffer))
+            else:
+                try:
+                    number = float(value) if typecode == 'd' else int(value)
+                except (TypeError, ValueError):
+                    number, present = (float('nan') if typecode == 'd' else 0), False
+                self.numeric[name].append(number)
+            self.valid[name].append(present)
+        self.length += 1
+
+    def extend(self, other: 'ProductColumns'):
+        for name, (buffer, offsets) in self.strings.items():
+            other_buffer, other_offsets = other.strings[name]
+            shift = len(buffer)
+            buffer += other_buffer
+            offsets.extend(offset + shift for offset in other_offsets[1:])
+        for name, values in self.numeric.items():
+            values.extend(other.numeric[name])
+        for name, valid in self.valid.items():
+            valid += other.valid[name]
+        self.length += other.length
+
+    def column(self, name: str) -> Union[array, List[Optional[str]]]:
+        if name in self.numeric:
+            return self.numeric[name]
+        buffer, offsets = self.strings[name]
+        valid = self.valid[name]
+        return [bytes(buffer[offsets[i]:offsets[i + 1]]).decode('utf-8') if valid[i] else None for i in range(self.length)]
+
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        columns = {name: self.column(name) for name, _, _ in PRODUCT_COLUMNS}
+        for i in range(self.length):
+            yield {name: (values[i] if self.valid[name][i] else None) for name, values in columns.items()}
+
+    # --- shared memory transfer ---
+    def _parts(self) -> List[Tuple[str, str, bytes]]:
+        parts = []
+        for name, _, _ in PRODUCT_COLUMNS:
+            if name in self.strings:
+                buffer, offsets = self.strings[name]
+                parts += [(name, 'buffer', bytes(buffer)), (name, 'offsets', offsets.tobytes())]
+            else:
+                parts.append((name, 'values', self.numeric[name].tobytes()))
+            parts.append((name, 'valid', bytes(self.valid[name])))
+        return parts
+
+    def to_shared_memory(self) -> Tuple[str, int, List[Tuple[str, str, int, int]]]:
+        '''Copies every column into one new shared memory block; returns (block name, rows, layout).'''
+        parts = self._parts()
+        block = shared_memory.SharedMemory(create=True, size=max(1, sum(len(data) for _, _, data in parts)))
+        layout, position = [], 0
+        for name, kind, data in parts:
+            block.buf[position:position + len(data)] = data
+            layout.append((name, kind, position, len(data)))
+            position += len(data)
+        block.close()
+        return block.name, self.length, layout
+
+    @classmethod
+    def from_shared_memory(cls, block_name: str, length: int, layout: List[Tuple[str, str, int, int]]) -> 'ProductColumns':
+        '''Reads a block written by to_shared_memory and unlinks it.'''
+        columns = cls()
+        columns.length = length
+        block = shared_memory.SharedMemory(name=block_name)
+        try:
+            for name, kind, position, size in layout:
+                data = block.buf[position:position + size]
+                if kind == 'buffer':
+                    columns.strings[name] = (bytearray(data), columns.strings[name][1])
+                elif kind == 'offsets':
+                    offsets = array('q')
+                    offsets.frombytes(data)
+                    columns.strings[name] = (columns.strings[name][0], offsets)
+                elif kind == 'values':
+                    columns.numeric[name] = array(columns.numeric[name].typecode)
+                    columns.numeric[name].frombytes(data)
+                else:
+                    columns.valid[name] = bytearray(data)
+                data.release()
+        finally:
+            block.close()
+            block.unlink()
+        return columns
+
+
+def _decode_page_columns(payload: Payload) -> Tuple[str, int, List[Tuple[str, str, int, int]]]:
+    columns = ProductColumns()
+    for product in json.loads(payload).get("products", []):
+        columns.append(product)
+    return columns.to_shared_memory()
+
+
+def _decode_page_products(payload: Payload) -> List[Product]:
+    return ProductsData.from_dict(json.loads(payload)).products
+
+
+def decode_columns(payloads: Iterable[Payload], workers: Optional[int] = None, chunksize: int = 4) -> ProductColumns:
+    '''
+    Decodes raw search/category/v3 response bodies into one ProductColumns using a process
+    pool. Workers hand pages back as shared memory blocks, so only block names and
+    layouts are pickled.
+    '''
+    result = ProductColumns()
+    # Workers must share the parent's tracker, or it would unlink blocks when they exit.
+    resource_tracker.ensure_running()
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        for block in executor.map(_decode_page_columns, payloads, chunksize=chunksize):
+            result.extend(ProductColumns.from_shared_memory(*block))
+    return result
+
+
+def decode_products(payloads: Iterable[Payload], workers: Optional[int] = None, chunksize: int = 4) -> List[Product]:
+    '''Decodes raw response bodies into Product objects in a process pool. Results are pickled back; prefer decode_columns for large scans.'''
+    products: List[Product] = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        for page in executor.map(_decode_page_products, payloads, chunksize=chunksize):
+            products.extend(page)
+    return products
@@ -1,5 +1,6 @@
+import sys
 from dataclasses import dataclass, field
-from typing import List, Optional, Any
+from typing import List, Optional, Any, Dict, Hashable, Callable
 
 
 @dataclass
@@ -20,7 +21,9 @@ class Image:
     description: str
 
     @classmethod
-    def from_dict(cls, data: dict) -> 'Image':
+    def from_dict(cls, data: dict, registry: Optional['ProductRegistry'] = None) -> 'Image':
+        if registry is not None:
+            return registry.image(data)
         return cls(**data)
 
 
@@ -41,7 +44,9 @@ class Brand:
     image: Optional[Any]  # Assuming image can be of any type or another structured type
 
     @classmethod
-    def from_dict(cls, data: dict) -> 'Brand':
+    def from_dict(cls, data: dict, registry: Optional['ProductRegistry'] = None) -> 'Brand':
+        if registry is not None:
+            return registry.brand(data)
         return cls(**data)
 
 
@@ -76,7 +81,9 @@ class Merchant:
     clickable: Optional[bool] = None  # Only present in previewMerchants
 
     @classmethod
-    def from_dict(cls, data: dict) -> 'Merchant':
+    def from_dict(cls, data: dict, registry: Optional['ProductRegistry'] = None) -> 'Merchant':
+        if registry is not None:
+            return registry.merchant(data)
         image_data = data.get('image')
         image = Image.from_dict(image_data) if image_data else None
         return cls(
@@ -96,9 +103,9 @@ class CheapestOffer:
     pricePerUnit: Optional[Any]
 
     @classmethod
-    def from_dict(cls, data: dict) -> 'CheapestOffer':
+    def from_dict(cls, data: dict, registry: Optional['ProductRegistry'] = None) -> 'CheapestOffer':
         price = Price.from_dict(data['price'])
-        merchant = Merchant.from_dict(data['merchant'])
+        merchant = Merchant.from_dict(data['merchant'], registry)
         return cls(
             id=data['id'],
             price=price,
@@ -114,8 +121,8 @@ class PreviewMerchants:
     merchants: List[Merchant]
 
     @classmethod
-    def from_dict(cls, data: dict) -> 'PreviewMerchants':
-        merchants = [Merchant.from_dict(m) for m in data.get('merchants', [])]
+    def from_dict(cls, data: dict, registry: Optional['ProductRegistry'] = None) -> 'PreviewMerchants':
+        merchants = [Merchant.from_dict(m, registry) for m in data.get('merchants', [])]
         return cls(
             count=data['count'],
             merchants=merchants
@@ -143,17 +150,17 @@ class Product:
     installmentPrice: Optional[Any]
 
     @classmethod
-    def from_dict(cls, data: dict) -> 'Product':
+    def from_dict(cls, data: dict, registry: Optional['ProductRegistry'] = None) -> 'Product':
         lowest_price = Price.from_dict(data['lowestPrice'])
-        image = Image.from_dict(data['image'])
+        image = Image.from_dict(data['image'], registry)
         rank = Rank.from_dict(data['rank'])
-        brand = Brand.from_dict(data['brand'])
+        brand = Brand.from_dict(data['brand'], registry)
         rating = Rating.from_dict(data['rating'])
         ribbon = Ribbon.from_dict(data['ribbon'])
-        cheapest_offer = CheapestOffer.from_dict(data['cheapestOffer'])
-        preview_merchants = PreviewMerchants.from_dict(data['previewMerchants'])
+        cheapest_offer = CheapestOffer.from_dict(data['cheapestOffer'], registry)
+        preview_merchants = PreviewMerchants.from_dict(data['previewMerchants'], registry)
         
-        return cls(
+        product = cls(
             id=data['id'],
             name=data['name'],
             description=data['description'],
@@ -172,6 +179,9 @@ class Product:
             previewMerchants=preview_merchants,
             installmentPrice=data.get('installmentPrice')
         )
+        if registry is not None:
+            registry.add_product(product)
+        return product
 
 
 @dataclass
@@ -179,6 +189,72 @@ class ProductsData:
     products: List[Product]
 
     @classmethod
-    def from_dict(cls, data: dict) -> 'ProductsData':
-        products = [Product.from_dict(prod) for prod in data.get('products', [])]
+    def from_dict(cls, data: dict, registry: Optional['ProductRegistry'] = None) -> 'ProductsData':
+        products = [Product.from_dict(prod, registry) for prod in data.get('products', [])]
         return cls(products=products)
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) and len(value) < 256 else value
+
+
+class ProductRegistry:
+    '''
+    Flyweight store for the objects a listing repeats thousands of times. Passed to the
+    from_dict methods, it returns one shared Image, Brand and Merchant per distinct value
+    (short strings sys.intern'ed) and indexes every decoded Product by brand and merchant.
+    The shared instances must be treated as read-only.
+    '''
+
+    def __init__(self):
+        self.images: Dict[Hashable, Image] = {}
+        self.brands: Dict[Hashable, Brand] = {}
+        self.merchants: Dict[Hashable, Merchant] = {}
+        self.products: Dict[str, Product] = {}
+        self.by_brand: Dict[str, List[Product]] = {}
+        self.by_merchant: Dict[str, List[Product]] = {}
+
+    def _shared(self, table: Dict[Hashable, Any], key: Hashable, build: Callable[[], Any]) -> Any:
+        value = table.get(key)
+        if value is None:
+            value = table[key] = build()
+        return value
+
+    def image(self, data: dict) -> Image:
+        key = (data.get('id'), data.get('url'), data.get('path'), data.get('description'))
+        return self._shared(self.images, key, lambda: Image(*(_intern(value) for value in key)))
+
+    def brand(self, data: dict) -> Brand:
+        image = data.get('image')
+        key = (data.get('id'), data.get('name'), image if isinstance(image, Hashable) else repr(image))
+        return self._shared(self.brands, key, lambda: Brand(id=_intern(data['id']), name=_intern(data['name']), image=image))
+
+    def merchant(self, data: dict) -> Merchant:
+        image_data = data.get('image')
+        key = (data.get('id'), data.get('name'), data.get('clickable'), tuple(sorted(image_data.items())) if image_data else None)
+        return self._shared(self.merchants, key, lambda: Merchant(
+            id=_intern(data['id']),
+            name=_intern(data['name']),
+            image=self.image(image_data) if image_data else None,
+            clickable=data.get('clickable'),
+        ))
+
+    def add_product(self, product: Product):
+        if product.id in self.products:
+            return
+        self.products[product.id] = product
+        self.by_brand.setdefault(product.brand.id, []).append(product)
+        merchant_ids = {product.cheapestOffer.merchant.id}
+        merchant_ids.update(merchant.id for merchant in product.previewMerchants.merchants)
+        for merchant_id in merchant_ids:
+            self.by_merchant.setdefault(merchant_id, []).append(product)
+
+    def products_by_brand(self, brand_id: str) -> List[Product]:
+        return self.by_brand.get(brand_id, [])
+
+    def products_by_merchant(self, merchant_id: str) -> List[Product]:
+        '''Products whose cheapest offer or preview merchants include the merchant.'''
+        return self.by_merchant.get(merchant_id, [])
+
+    def merchant_counts(self) -> Dict[str, int]:
+        return {merchant_id: len(products) for merchant_id, products in self.by_merchant.items()}
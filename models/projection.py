@@ -0,0 +1,73 @@
+import json
+import keyword
+import re
+from collections import namedtuple
+from typing import Dict, Any, List, Iterable, Union, Tuple, Callable
+
+
+def _getter(keys: List[str]) -> Callable[[Dict[str, Any]], Any]:
+    '''Reads one dotted path; None as soon as a step is missing or not a dict.'''
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda product: product.get(key)
+    if len(keys) == 2:
+        first, second = keys
+
+        def get_two(product: Dict[str, Any]) -> Any:
+            value = product.get(first)
+            return value.get(second) if isinstance(value, dict) else None
+        return get_two
+
+    def get_path(product: Dict[str, Any]) -> Any:
+        value = product
+        for key in keys:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(key)
+        return value
+    return get_path
+
+
+def _field_name(path: str) -> str:
+    name = re.sub(r'\W', '_', path.replace('.', '_'))
+    return name + '_' if keyword.iskeyword(name) or not name.isidentifier() else name
+
+
+class Projection:
+    '''
+    Decodes only the declared fields of listing products, e.g.
+    Projection("id, name, lowestPrice.amount, rating.average"), into compact namedtuples
+    (dots become underscores: record.lowestPrice_amount). Each field path becomes one getter,
+    so no Product, Price or Merchant objects are built for the rest. Missing or null values,
+    or a non-object value along a path, project to None.
+    '''
+
+    def __init__(self, fields: Union[str, Iterable[str]]):
+        if isinstance(fields, str):
+            fields = fields.split(',')
+        self.fields: Tuple[str, ...] = tuple(field.strip() for field in fields if field.strip())
+        if not self.fields:
+            raise ValueError("A projection needs at least one field.")
+        self.record = namedtuple('ProjectedProduct', [_field_name(field) for field in self.fields], rename=True)
+        self._extract = self._compile()
+
+    def __repr__(self):
+        return f"Projection({', '.join(self.fields)})"
+
+    def _compile(self) -> Callable[[Dict[str, Any]], tuple]:
+        getters = [_getter(field.split('.')) for field in self.fields]
+        make = self.record._make
+        return lambda product: make([get(product) for get in getters])
+
+    def project(self, product: Dict[str, Any]) -> tuple:
+        return self._extract(product)
+
+    def project_many(self, products: Iterable[Dict[str, Any]]) -> List[tuple]:
+        extract = self._extract
+        return [extract(product) for product in products]
+
+    def project_response(self, data: Any) -> List[tuple]:
+        '''Products of a get_products / search/category/v3 response (dict, or raw JSON bytes/str).'''
+        if isinstance(data, (bytes, str)):
+            data = json.loads(data)
+        return self.project_many((data or {}).get("products", []))
@@ -0,0 +1,130 @@
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, List, Iterator, Set, Tuple
+import re
+from api_client.base_layer import CATEGORIES_FILE, suggest, get_keywords, get_keywords_sub, get_main_categories_from_json
+
+_TOKEN_START = re.compile(r'\w+')
+# Sorts after every character a prefix can be followed by, so [prefix, prefix + _END) is a range.
+_END = '\U0010ffff'
+
+
+def normalize(text: str) -> str:
+    return ' '.join(text.casefold().split())
+
+
+@dataclass(frozen=True)
+class Completion:
+    name: str
+    kind: str
+    id: Optional[str] = None
+    url: Optional[str] = None
+
+    def __str__(self):
+        return f"Completion(name={self.name}, kind={self.kind}, id={self.id})"
+
+
+class PrefixIndex:
+    '''
+    Sorted array of normalised keys with a parallel array of completions.
+    Every word start of a name is a key, so "ryz" finds "AMD Ryzen 7".
+    A prefix query is two bisects; new entries are merged in on the next query.
+    '''
+
+    def __init__(self):
+        self._keys: List[str] = []
+        self._values: List[Completion] = []
+        self._pending: List[Tuple[str, Completion]] = []
+        self._seen: Set[Completion] = set()
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def add(self, completion: Completion):
+        if completion in self._seen:
+            return
+        self._seen.add(completion)
+        name = normalize(completion.name)
+        for match in _TOKEN_START.finditer(name):
+            self._pending.append((name[match.start():], completion))
+
+    def _merge(self):
+        entries = sorted(list(zip(self._keys, self._values)) + self._pending, key=lambda entry: entry[0])
+        self._keys = [key for key, _ in entries]
+        self._values = [value for _, value in entries]
+        self._pending = []
+
+    def lookup(self, prefix: str, limit: int = 10) -> List[Completion]:
+        if self._pending:
+            self._merge()
+        prefix = normalize(prefix)
+        start = bisect_left(self._keys, prefix)
+        end = bisect_left(self._keys, prefix + _END, lo=start)
+        results: List[Completion] = []
+        for value in self._values[start:end]:
+            if value not in results:
+                results.append(value)
+                if len(results) == limit:
+                    break
+        return results
+
+
+def _named_entries(data: Any) -> Iterator[Dict[str, Any]]:
+    '''Yields every dict with a string name found anywhere in an upstream payload.'''
+    if isinstance(data, dict):
+        if isinstance(data.get("name"), str):
+            yield data
+        for value in data.values():
+            yield from _named_entries(value)
+    elif isinstance(data, list):
+        for item in data:
+            yield from _named_entries(item)
+
+
+class Autocompleter:
+    '''
+    Answers typeahead queries from a local PrefixIndex and only calls search/suggest
+    on a miss. Every suggest response is folded back into the index.
+    '''
+
+    def __init__(self, index: Optional[PrefixIndex] = None):
+        self.index = index or PrefixIndex()
+        self._fetched: Set[str] = set()
+
+    def add_categories(self, categories: List[Dict[str, Any]]):
+        for category in categories:
+            if category.get("name"):
+                self.index.add(Completion(name=category["name"], kind='category', id=category.get("id"), url=category.get("path")))
+
+    def add_keywords(self, data: Any):
+        for entry in _named_entries(data):
+            self.index.add(Completion(name=entry["name"], kind='keyword', id=entry.get("id"), url=entry.get("url")))
+
+    def add_suggest_response(self, data: Optional[Dict[str, Any]]):
+        if not data:
+            return
+        for entry in _named_entries(data.get("suggestions", [])):
+            self.index.add(Completion(name=entry["name"], kind='suggestion', id=entry.get("id"), url=entry.get("url")))
+        for product in data.get("products", []):
+            if product.get("name"):
+                self.index.add(Completion(name=product["name"], kind='product', id=product.get("id"), url=product.get("url")))
+
+    def load_snapshot(self, json_file: str = CATEGORIES_FILE):
+        self.add_categories(get_main_categories_from_json(json_file) or [])
+
+    def load_keywords(self, category_ids: List[str]):
+        '''Accepts both category ids ('t9') and subcategory ids ('cl40').'''
+        for category_id in category_ids:
+            if category_id.startswith('cl'):
+                self.add_keywords(get_keywords_sub(category_id.replace('cl', '')))
+            else:
+                self.add_keywords(get_keywords(category_id))
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Completion]:
+        results = self.index.lookup(prefix, limit)
+        query = normalize(prefix)
+        if results or not query or query in self._fetched:
+            return results
+        self._fetched.add(query)
+        self.add_suggest_response(suggest(query))
+        return self.index.lookup(prefix, limit)
@@ -0,0 +1,147 @@
+import argparse
+import re
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, Tuple, Callable
+from api_client.base_layer import (
+    get_filters, get_filter_data, get_products, get_category_data, get_breadcrumbs,
+    get_product_rank, get_product_details,
+)
+from services.model_layer import SubCategory
+from transport import http_client
+from transport.cache import ResponseCache
+
+_SUBCATEGORY = re.compile(r'/cl/?(\d+)')
+_PRODUCT = re.compile(r'/pl/(?:initial/)?(\d+)-(\d+)')
+_FILTER = re.compile(r'[?&]af_(\w+)=')
+
+
+@dataclass
+class WarmupTargets:
+    subcategories: List[str] = field(default_factory=list)
+    filters: List[Tuple[str, str]] = field(default_factory=list)
+    products: List[str] = field(default_factory=list)
+
+    def __str__(self):
+        return f"WarmupTargets(subcategories={len(self.subcategories)}, filters={len(self.filters)}, products={len(self.products)})"
+
+
+def targets_from_access_log(path: str, top_n: int = 100) -> WarmupTargets:
+    '''
+    Most requested subcategories, (subcategory, filter) pairs and products in an access log.
+    Lines are matched on /cl/<id>, /pl/<sub>-<product> and af_<FILTER>= query parameters.
+    '''
+    subcategories, filters, products = Counter(), Counter(), Counter()
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            for sub in _SUBCATEGORY.findall(line):
+                subcategories[f"cl{sub}"] += 1
+                for filter_id in _FILTER.findall(line):
+                    filters[(f"cl{sub}", filter_id)] += 1
+            for sub, product in _PRODUCT.findall(line):
+                subcategories[f"cl{sub}"] += 1
+                products[product] += 1
+    return WarmupTargets(
+        subcategories=[sub for sub, _ in subcategories.most_common(top_n)],
+        filters=[pair for pair, _ in filters.most_common(top_n)],
+        products=[product for product, _ in products.most_common(top_n)],
+    )
+
+
+@dataclass
+class WarmupStats:
+    requests: int = 0
+    failed: int = 0
+    cached: int = 0
+
+    def __str__(self):
+        return f"WarmupStats(requests={self.requests}, failed={self.failed}, cached={self.cached})"
+
+
+class CacheWarmer:
+    '''
+    Prefetches the responses hot pages need into the transport response cache.
+    All requests go through fetch_json, so the global rate limit (http_client.set_rate_limit)
+    applies and already cached responses are not fetched again. `ready` is set when warm() ends.
+    '''
+
+    def __init__(self, cache: Optional[ResponseCache] = None, max_workers: int = 8, include_facets: bool = False):
+        if cache is not None:
+            http_client.set_cache(cache)
+        elif http_client.get_cache() is None:
+            http_client.set_cache(ResponseCache())
+        self.cache = http_client.get_cache()
+        self.max_workers = max_workers
+        self.include_facets = include_facets
+        self.ready = threading.Event()
+        self.stats = WarmupStats()
+        self._lock = threading.Lock()
+
+    def _run(self, function: Callable, *args) -> Optional[Dict[str, Any]]:
+        data = function(*args)
+        with self._lock:
+            self.stats.requests += 1
+            self.stats.failed += data is None
+        return data
+
+    def _warm_subcategory(self, executor: ThreadPoolExecutor, subcategory_id: str) -> list:
+        # The exact requests SubCategory.get_product_ids, get_filters and Filter.get_options
+        # send with their defaults, so the warmed cache keys are the ones the service asks for.
+        simple_id = subcategory_id.replace('cl', '')
+        futures = [
+            executor.submit(self._run, get_products, simple_id, 10, *SubCategory.get_product_query()),
+            executor.submit(self._run, get_category_data, subcategory_id),
+            executor.submit(self._run, get_breadcrumbs, subcategory_id),
+        ]
+        filters = self._run(get_filters, subcategory_id) or []
+        if self.include_facets:
+            futures += [executor.submit(self._run, get_filter_data, simple_id, data.get("id")) for data in filters]
+        return futures
+
+    def _warm_product(self, product_id: str):
+        rank = self._run(get_product_rank, product_id) or {}
+        match = re.search(r'cl/(\d+)/', rank.get("url") or '')
+        if match:
+            self._run(get_product_details, match.group(1), product_id)
+
+    def warm(self, targets: WarmupTargets) -> WarmupStats:
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self._warm_subcategory, executor, sub) for sub in dict.fromkeys(targets.subcategories)]
+            futures += [executor.submit(self._run, get_filter_data, sub.replace('cl', ''), filter_id) for sub, filter_id in dict.fromkeys(targets.filters)]
+            futures += [executor.submit(self._warm_product, product) for product in dict.fromkeys(targets.products)]
+            nested = [future.result() for future in futures]
+            for result in nested:
+                for future in result or []:
+                    future.result()
+        self.stats.cached = len(self.cache)
+        self.ready.set()
+        return self.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prefetch hot subcategories, filters and products into a response cache file.")
+    parser.add_argument("cache_file", help="gzip JSONL cache snapshot to write; load it with ResponseCache.load at service start")
+    parser.add_argument("--subcategory", action='append', default=[], help="Subcategory id, e.g. cl40 (repeatable)")
+    parser.add_argument("--filter", action='append', default=[], help="subcategory:filter, e.g. cl40:BRAND (repeatable)")
+    parser.add_argument("--product", action='append', default=[], help="Product id (repeatable)")
+    parser.add_argument("--access-log", help="Learn the top-N targets from an access log")
+    parser.add_argument("--top", type=int, default=100)
+    parser.add_argument("--ttl", type=float, default=3600)
+    parser.add_argument("--rate", type=float, default=5, help="Upstream requests per second")
+    parser.add_argument("--facets", action='store_true', help="Also prefetch every facet of each subcategory")
+    args = parser.parse_args()
+
+    targets = targets_from_access_log(args.access_log, args.top) if args.access_log else WarmupTargets()
+    targets.subcategories += args.subcategory
+    targets.filters += [tuple(value.split(':', 1)) for value in args.filter]
+    targets.products += args.product
+    http_client.set_rate_limit(args.rate)
+    cache = ResponseCache(ttl=args.ttl, max_entries=1_000_000)
+    print(CacheWarmer(cache, include_facets=args.facets).warm(targets))
+    cache.save(args.cache_file)
+
+
+if __name__ == "__main__":
+    main()
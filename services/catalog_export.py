@@ -0,0 +1,309 @@
+import argparse
+import gzip
+import json
+import os
+import queue
+import threading
+from dataclasses import dataclass, asdict
+from typing import Optional, Dict, Any, List, Iterator, Set
+from api_client.base_layer import IncompleteListing, get_category_data, iter_product_pages, get_main_category_ids
+from models.product import Product
+
+# Sentinels passed between pipeline stages.
+_SUBCATEGORY_DONE = object()
+_SUBCATEGORY_FAILED = object()
+_END = object()
+
+PARQUET_COLUMNS = [
+    ('subcategoryId', 'string'), ('id', 'string'), ('name', 'string'), ('description', 'string'),
+    ('url', 'string'), ('classification', 'string'), ('lowestPrice', 'float64'), ('currency', 'string'),
+    ('brandId', 'string'), ('brandName', 'string'), ('rank', 'int64'), ('ratingAverage', 'float64'),
+    ('ratingCount', 'int64'), ('cheapestMerchantId', 'string'), ('cheapestMerchantName', 'string'),
+    ('merchantCount', 'int64'),
+]
+
+
+@dataclass
+class ExportStats:
+    subcategories: int = 0
+    skipped_subcategories: int = 0
+    failed_subcategories: int = 0
+    failed_categories: int = 0
+    pages: int = 0
+    products: int = 0
+    decode_errors: int = 0
+
+    def __str__(self):
+        return (f"ExportStats(subcategories={self.subcategories}, skipped={self.skipped_subcategories}, "
+                f"failed={self.failed_subcategories}, failed_categories={self.failed_categories}, pages={self.pages}, products={self.products}, decode_errors={self.decode_errors})")
+
+
+def _to_float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def flat_record(subcategory_id: str, product: Product) -> Dict[str, Any]:
+    '''Flat scalar columns of a product, as written to Parquet.'''
+    return {
+        'subcategoryId': subcategory_id,
+        'id': product.id,
+        'name': product.name,
+        'description': product.description,
+        'url': product.url,
+        'classification': product.classification,
+        'lowestPrice': _to_float(product.lowestPrice.amount),
+        'currency': product.lowestPrice.currency,
+        'brandId': product.brand.id,
+        'brandName': product.brand.name,
+        'rank': product.rank.rank,
+        'ratingAverage': _to_float(product.rating.average),
+        'ratingCount': product.rating.count,
+        'cheapestMerchantId': product.cheapestOffer.merchant.id,
+        'cheapestMerchantName': product.cheapestOffer.merchant.name,
+        'merchantCount': product.previewMerchants.count,
+    }
+
+
+class JsonlPartitionWriter:
+    '''One gzip-compressed JSONL file per subcategory: <dir>/subcategory=<id>/products.jsonl.gz'''
+    suffix = 'products.jsonl.gz'
+
+    def __init__(self, path: str, subcategory_id: str):
+        self.subcategory_id = subcategory_id
+        self._file = gzip.open(path, 'wt', encoding='utf-8')
+
+    def write(self, products: List[Product]):
+        for product in products:
+            record = asdict(product)
+            record['subcategoryId'] = self.subcategory_id
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetPartitionWriter:
+    '''One Parquet file per subcategory with a row group per page: <dir>/subcategory=<id>/products.parquet'''
+    suffix = 'products.parquet'
+
+    def __init__(self, path: str, subcategory_id: str):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Parquet export requires pyarrow: pip install pyarrow") from e
+        self._pa = pa
+        self.subcategory_id = subcategory_id
+        self.schema = pa.schema([(name, getattr(pa, type_name)()) for name, type_name in PARQUET_COLUMNS])
+        self._writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+
+    def write(self, products: List[Product]):
+        records = [flat_record(self.subcategory_id, product) for product in products]
+        self._writer.write_table(self._pa.Table.from_pylist(records, schema=self.schema))
+
+    def close(self):
+        self._writer.close()
+
+
+WRITERS = {'jsonl': JsonlPartitionWriter, 'parquet': ParquetPartitionWriter}
+
+
+class Checkpoint:
+    '''Set of fully exported subcategory ids, rewritten atomically after each one completes.'''
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Set[str] = set()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.done = set(json.load(f).get("done", []))
+
+    def mark_done(self, subcategory_id: str):
+        self.done.add(subcategory_id)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"done": sorted(self.done)}, f)
+        os.replace(tmp_path, self.path)
+
+
+def iter_subcategory_ids(root_ids: List[str], failed: Optional[List[str]] = None) -> Iterator[str]:
+    '''
+    Depth-first walk of the navigation hierarchy, yielding each subcategory id once.
+    A category whose hierarchy request fails is skipped with a warning and appended to failed.
+    '''
+    visited: Set[str] = set()
+    stack = list(reversed(root_ids))
+    while stack:
+        node_id = stack.pop()
+        if node_id in visited:
+            continue
+        visited.add(node_id)
+        if node_id.startswith('cl'):
+            yield node_id
+            continue
+        data = get_category_data(node_id)
+        if data is None:
+            print(f"Warning: No hierarchy data for {node_id}; its subcategories are skipped.")
+            if failed is not None:
+                failed.append(node_id)
+            continue
+        children = [child.get("id") for child in data.get("categories") or [] if isinstance(child, dict)]
+        stack.extend(reversed([child_id for child_id in children if child_id and child_id.startswith(('cl', 't'))]))
+
+
+class CatalogExporter:
+    '''
+    Crawl, decode and write run as three threads joined by bounded queues, so a slow
+    writer stalls the crawler instead of letting pages pile up in memory. Each
+    subcategory is written to a temporary file that is renamed and checkpointed once
+    complete; an interrupted run resumes at the first unfinished subcategory. A subcategory
+    whose pages cannot all be fetched is discarded and stays pending for the next run.
+    '''
+
+    def __init__(self, output_dir: str, fmt: str = 'jsonl', page_size: int = 100, queue_size: int = 8, checkpoint_file: Optional[str] = None):
+        if fmt not in WRITERS:
+            raise ValueError(f"Unsupported export format '{fmt}'. Use one of {sorted(WRITERS)}.")
+        self.output_dir = output_dir
+        self.writer_cls = WRITERS[fmt]
+        self.page_size = page_size
+        self.queue_size = queue_size
+        self.checkpoint = Checkpoint(checkpoint_file or os.path.join(output_dir, '_checkpoint.json'))
+        self.stats = ExportStats()
+        self._stop = threading.Event()
+
+    def _put(self, q: queue.Queue, item: Any):
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q: queue.Queue) -> Any:
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _stage(self, target, out_q: queue.Queue, *args):
+        try:
+            target(out_q, *args)
+        except BaseException as e:
+            self._put(out_q, e)
+
+    def _crawl(self, out_q: queue.Queue, root_ids: List[str]):
+        failed_categories: List[str] = []
+        for subcategory_id in iter_subcategory_ids(root_ids, failed_categories):
+            self.stats.failed_categories = len(failed_categories)
+            if self._stop.is_set():
+                break
+            if subcategory_id in self.checkpoint.done:
+                self.stats.skipped_subcategories += 1
+                continue
+            self._put(out_q, subcategory_id)
+            try:
+                for page in iter_product_pages(subcategory_id.replace('cl', ''), self.page_size):
+                    if self._stop.is_set():
+                        break
+                    self._put(out_q, page.get("products", []))
+            except IncompleteListing as e:
+                print(f"Warning: {e}; {subcategory_id} is left for the next run.")
+                self._put(out_q, _SUBCATEGORY_FAILED)
+                continue
+            self._put(out_q, _SUBCATEGORY_DONE)
+        self.stats.failed_categories = len(failed_categories)
+        self._put(out_q, _END)
+
+    def _decode(self, out_q: queue.Queue, in_q: queue.Queue):
+        while True:
+            item = self._get(in_q)
+            if isinstance(item, list):
+                products = []
+                for data in item:
+                    try:
+                        products.append(Product.from_dict(data))
+                    except (KeyError, TypeError) as e:
+                        self.stats.decode_errors += 1
+                        print(f"Warning: Could not decode product {data.get('id')}. Exception: {e!r}")
+                item = products
+            self._put(out_q, item)
+            if item is _END or isinstance(item, BaseException):
+                return
+
+    def _partition_path(self, subcategory_id: str) -> str:
+        directory = os.path.join(self.output_dir, f"subcategory={subcategory_id}")
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, self.writer_cls.suffix)
+
+    def run(self, root_ids: Optional[List[str]] = None) -> ExportStats:
+        '''Exports every subcategory below root_ids (default: the main categories in categories.json; ValueError if unreadable).'''
+        if root_ids is None:
+            root_ids = get_main_category_ids()
+        os.makedirs(self.output_dir, exist_ok=True)
+        raw_q: queue.Queue = queue.Queue(self.queue_size)
+        decoded_q: queue.Queue = queue.Queue(self.queue_size)
+        threads = [
+            threading.Thread(target=self._stage, args=(self._crawl, raw_q, root_ids), daemon=True),
+            threading.Thread(target=self._stage, args=(self._decode, decoded_q, raw_q), daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+
+        writer, path = None, None
+        try:
+            while True:
+                item = decoded_q.get()
+                if item is _END:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                if isinstance(item, str):
+                    path = self._partition_path(item)
+                    writer = self.writer_cls(path + '.tmp', item)
+                elif item is _SUBCATEGORY_DONE:
+                    writer.close()
+                    os.replace(path + '.tmp', path)
+                    self.checkpoint.mark_done(writer.subcategory_id)
+                    self.stats.subcategories += 1
+                    writer = None
+                elif item is _SUBCATEGORY_FAILED:
+                    writer.close()
+                    os.remove(path + '.tmp')
+                    self.stats.failed_subcategories += 1
+                    writer = None
+                else:
+                    writer.write(item)
+                    self.stats.pages += 1
+                    self.stats.products += len(item)
+        finally:
+            self._stop.set()
+            if writer is not None:
+                writer.close()
+            for thread in threads:
+                thread.join()
+        return self.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export every product of the catalog, partitioned by subcategory.")
+    parser.add_argument("output_dir")
+    parser.add_argument("--format", choices=sorted(WRITERS), default='jsonl')
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--root", action='append', dest='roots', help="Category or subcategory id to export (repeatable). Defaults to all main categories.")
+    args = parser.parse_args()
+
+    try:
+        roots = args.roots or get_main_category_ids()
+    except ValueError as e:
+        parser.error(str(e))
+    stats = CatalogExporter(args.output_dir, fmt=args.format, page_size=args.page_size).run(roots)
+    print(stats)
+
+
+if __name__ == "__main__":
+    main()
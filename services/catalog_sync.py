@@ -0,0 +1,186 @@
+import argparse
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, List, Callable, Iterable, Tuple
+from api_client.base_layer import IncompleteListing, get_products, get_filters, iter_product_pages, get_main_category_ids
+from services.catalog_export import iter_subcategory_ids
+
+PageCallback = Callable[[str, int, List[Dict[str, Any]]], None]
+
+
+def _digest(value: Any) -> str:
+    return hashlib.sha1(json.dumps(value, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def page_fingerprint(products: List[Dict[str, Any]]) -> str:
+    '''Changes whenever a product enters, leaves, moves or changes price or cheapest merchant on the page.'''
+    return _digest([
+        (p.get("id"), (p.get("lowestPrice") or {}).get("amount"), ((p.get("cheapestOffer") or {}).get("merchant") or {}).get("id"))
+        for p in products
+    ])
+
+
+@dataclass
+class SyncStats:
+    subcategories: int = 0
+    unchanged: int = 0
+    recrawled: int = 0
+    failed: int = 0
+    failed_categories: int = 0
+    pages_fetched: int = 0
+    pages_changed: int = 0
+    requests: int = 0
+
+    def __str__(self):
+        return (f"SyncStats(subcategories={self.subcategories}, unchanged={self.unchanged}, recrawled={self.recrawled}, "
+                f"failed={self.failed}, failed_categories={self.failed_categories}, pages_fetched={self.pages_fetched}, pages_changed={self.pages_changed}, requests={self.requests})")
+
+
+class SyncState:
+    '''Per-subcategory fingerprints from the last sync, stored as JSON.'''
+
+    def __init__(self, path: str):
+        self.path = path
+        self.subcategories: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.subcategories = json.load(f)
+
+    def get(self, subcategory_id: str) -> Dict[str, Any]:
+        return self.subcategories.get(subcategory_id, {})
+
+    def set(self, subcategory_id: str, fingerprint: str, pages: List[str]):
+        self.subcategories[subcategory_id] = {"fingerprint": fingerprint, "pages": pages, "synced": int(time.time())}
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.subcategories, f)
+        os.replace(tmp_path, self.path)
+
+
+class CatalogSync:
+    '''
+    Probes each subcategory with one request (the first product page, plus the filter
+    list when probe_filters is set) and compares the fingerprint with the last sync.
+    Only subcategories whose fingerprint moved are paged through, and on_page is only
+    called for pages whose own fingerprint changed. The probe doubles as the first page.
+    Changes past the first page that move neither the total nor the facets are caught by
+    re-crawling anything last crawled more than max_age seconds ago. A subcategory whose
+    probe or pagination fails keeps its previous state and is retried on the next run.
+    '''
+
+    def __init__(self, state_file: str, page_size: int = 100, probe_filters: bool = False, on_page: Optional[PageCallback] = None, max_age: Optional[float] = 7 * 24 * 3600):
+        self.state = SyncState(state_file)
+        self.max_age = max_age
+        self.page_size = page_size
+        self.probe_filters = probe_filters
+        self.on_page = on_page
+        self.stats = SyncStats()
+
+    def probe(self, subcategory_id: str) -> Tuple[str, Dict[str, Any]]:
+        '''Returns (fingerprint, first page) for a subcategory. Raises IncompleteListing if a probe request fails.'''
+        simple_id = subcategory_id.replace('cl', '')
+        first_page = get_products(simple_id, self.page_size)
+        self.stats.requests += 1
+        if first_page is None:
+            raise IncompleteListing(simple_id, 0, None)
+        parts = [first_page.get("totalProductHits"), page_fingerprint(first_page.get("products", []))]
+        if self.probe_filters:
+            filters = get_filters(simple_id)
+            self.stats.requests += 1
+            if filters is None:
+                raise IncompleteListing(simple_id, 0, first_page.get("totalProductHits"))
+            parts.append(_digest(filters))
+        return _digest(parts), first_page
+
+    def sync_subcategory(self, subcategory_id: str) -> bool:
+        '''Returns True if the subcategory was re-crawled. Raises IncompleteListing, leaving the state untouched, if it could not be fetched in full.'''
+        self.stats.subcategories += 1
+        previous = self.state.get(subcategory_id)
+        fingerprint, first_page = self.probe(subcategory_id)
+        expired = self.max_age is not None and time.time() - previous.get("synced", 0) > self.max_age
+        if fingerprint == previous.get("fingerprint") and not expired:
+            self.stats.unchanged += 1
+            return False
+
+        self.stats.recrawled += 1
+        old_pages = previous.get("pages", [])
+        new_pages = []
+        pages = [first_page] if first_page.get("products") else []
+        offset = len(first_page.get("products", []))
+        if pages and offset < first_page.get("totalProductHits", 0):
+            pages = itertools.chain(pages, iter_product_pages(subcategory_id.replace('cl', ''), self.page_size, offset=offset))
+        offset = 0
+        for index, page in enumerate(pages):
+            if index > 0:
+                self.stats.requests += 1
+            self.stats.pages_fetched += 1
+            products = page.get("products", [])
+            page_print = page_fingerprint(products)
+            new_pages.append(page_print)
+            if index >= len(old_pages) or old_pages[index] != page_print:
+                self.stats.pages_changed += 1
+                if self.on_page:
+                    self.on_page(subcategory_id, offset, products)
+            offset += len(products)
+        total = first_page.get("totalProductHits", 0)
+        if offset < total:
+            raise IncompleteListing(subcategory_id.replace('cl', ''), offset, total)
+        self.state.set(subcategory_id, fingerprint, new_pages)
+        return True
+
+    def run(self, subcategory_ids: Iterable[str]) -> SyncStats:
+        for subcategory_id in subcategory_ids:
+            try:
+                self.sync_subcategory(subcategory_id)
+            except IncompleteListing as e:
+                self.stats.failed += 1
+                print(f"Warning: {e}; {subcategory_id} keeps its previous sync state.")
+                continue
+            self.state.save()
+        return self.stats
+
+    def sync_tree(self, root_ids: List[str]) -> SyncStats:
+        '''run() over every subcategory below root_ids; categories whose hierarchy cannot be fetched are counted and skipped.'''
+        failed: List[str] = []
+        self.run(iter_subcategory_ids(root_ids, failed))
+        self.stats.failed_categories = len(failed)
+        return self.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-crawl only the subcategories and pages that changed since the last sync.")
+    parser.add_argument("state_file")
+    parser.add_argument("--output", help="gzip JSONL file receiving the products of changed pages")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--probe-filters", action='store_true', help="Also fingerprint the filter list (one extra request per subcategory)")
+    parser.add_argument("--max-age-days", type=float, default=7, help="Re-crawl subcategories last crawled longer ago than this, changed or not")
+    parser.add_argument("--root", action='append', dest='roots', help="Category or subcategory id to sync (repeatable). Defaults to all main categories.")
+    args = parser.parse_args()
+
+    try:
+        roots = args.roots or get_main_category_ids()
+    except ValueError as e:
+        parser.error(str(e))
+    output = gzip.open(args.output, 'at', encoding='utf-8') if args.output else None
+
+    def write_page(subcategory_id: str, offset: int, products: List[Dict[str, Any]]):
+        for product in products:
+            output.write(json.dumps(dict(product, subcategoryId=subcategory_id), ensure_ascii=False) + "\n")
+
+    try:
+        sync = CatalogSync(args.state_file, args.page_size, args.probe_filters, write_page if output else None, args.max_age_days * 24 * 3600)
+        print(sync.sync_tree(roots))
+    finally:
+        if output:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
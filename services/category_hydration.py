@@ -0,0 +1,87 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, Union, Callable
+from api_client.base_layer import get_keywords, get_keywords_sub, get_popular_products, get_category_data, get_breadcrumbs
+from services.model_layer import Category, SubCategory
+
+
+def _keywords(category_id: str) -> Optional[Dict[str, Any]]:
+    if category_id.startswith('cl'):
+        return get_keywords_sub(category_id.replace('cl', ''))
+    return get_keywords(category_id)
+
+
+# Field name -> endpoint, the same four requests old/categories.get_category_data made in sequence.
+ENDPOINTS: Dict[str, Callable[[str], Optional[Dict[str, Any]]]] = {
+    'keywords': _keywords,
+    'popular_products': get_popular_products,
+    'hierarchy': get_category_data,
+    'breadcrumbs': get_breadcrumbs,
+}
+
+
+@dataclass
+class HydratedCategory:
+    id: str
+    keywords: Optional[Any] = None
+    popular_products: Optional[Any] = None
+    hierarchy: Optional[Dict[str, Any]] = None
+    breadcrumbs: Optional[Any] = None
+    failed: List[str] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def __str__(self):
+        return f"HydratedCategory(id={self.id}, name={self.name}, failed={self.failed}, elapsed={self.elapsed:.3f}s)"
+
+    @property
+    def category(self) -> Union[Category, SubCategory]:
+        return SubCategory(self.id) if self.id.startswith('cl') else Category(self.id)
+
+    @property
+    def name(self) -> Optional[str]:
+        return (self.hierarchy or {}).get("name")
+
+    @property
+    def path(self) -> Optional[str]:
+        return (self.hierarchy or {}).get("path")
+
+    @property
+    def children_ids(self) -> List[str]:
+        children = (self.hierarchy or {}).get("categories")
+        return [child.get("id") for child in children if isinstance(child, dict)] if isinstance(children, list) else []
+
+
+class CategoryHydrator:
+    '''
+    Fetches every ENDPOINTS response for one or many categories concurrently. All requests
+    share one pool, so a category is ready after its slowest endpoint rather than the sum of
+    all four, and hydrating many categories keeps the pool full.
+    '''
+
+    def __init__(self, max_workers: int = 16, endpoints: Optional[Dict[str, Callable]] = None):
+        self.max_workers = max_workers
+        self.endpoints = endpoints or ENDPOINTS
+
+    def hydrate(self, category_id: str) -> HydratedCategory:
+        return self.hydrate_many([category_id])[0]
+
+    def hydrate_many(self, category_ids: List[str]) -> List[HydratedCategory]:
+        '''Results in the order of category_ids; endpoints that failed are listed in `failed`.'''
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                category_id: {name: executor.submit(endpoint, category_id) for name, endpoint in self.endpoints.items()}
+                for category_id in dict.fromkeys(category_ids)
+            }
+            hydrated = {}
+            for category_id, responses in futures.items():
+                category = HydratedCategory(category_id)
+                for name, future in responses.items():
+                    data = future.result()
+                    setattr(category, name, data)
+                    if data is None:
+                        category.failed.append(name)
+                category.elapsed = time.perf_counter() - started
+                hydrated[category_id] = category
+        return [hydrated[category_id] for category_id in category_ids]
@@ -0,0 +1,116 @@
+import argparse
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field, asdict
+from typing import Optional, Dict, Any, List, Iterator, Callable, Union
+from api_client.base_layer import get_category_data, get_main_category_ids
+from services.model_layer import Category, SubCategory
+
+
+@dataclass
+class TreeNode:
+    id: str
+    parent_id: Optional[str]
+    depth: int
+    name: Optional[str] = None
+    path: Optional[str] = None
+    children: List[str] = field(default_factory=list)
+    failed: bool = False
+
+    @property
+    def is_subcategory(self) -> bool:
+        return self.id.startswith('cl')
+
+    def to_model(self) -> Union[Category, SubCategory]:
+        return SubCategory(self.id) if self.is_subcategory else Category(self.id)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class CategoryTreeWalker:
+    '''
+    Concurrent breadth-first walk of the navigation hierarchy. Each category ('t' id) costs
+    exactly one hierarchy request, issued as soon as its parent has been expanded, with at
+    most max_workers in flight. Subcategories ('cl' ids) are leaves and take their name and
+    path from the parent's listing. Ids are visited once, however many parents list them.
+    '''
+
+    def __init__(self, max_workers: int = 8, max_depth: Optional[int] = None, on_node: Optional[Callable[[TreeNode], None]] = None):
+        self.max_workers = max_workers
+        self.max_depth = max_depth
+        self.on_node = on_node
+        self.requests = 0
+
+    def _expand(self, node: TreeNode) -> TreeNode:
+        data = get_category_data(node.id)
+        if data is None:
+            node.failed = True
+            return node
+        children = data.get("categories")
+        node.name = node.name or data.get("name")
+        node.path = node.path or data.get("path")
+        node.children = [child for child in children if isinstance(child, dict)] if isinstance(children, list) else []
+        return node
+
+    def iter_nodes(self, root_ids: List[str]) -> Iterator[TreeNode]:
+        '''Yields every node as soon as it is known; categories once their children are listed.'''
+        visited = set()
+        pending = set()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            def visit(node: TreeNode):
+                visited.add(node.id)
+                if node.is_subcategory or (self.max_depth is not None and node.depth >= self.max_depth):
+                    return node
+                pending.add(executor.submit(self._expand, node))
+
+            ready = [visit(TreeNode(root_id, None, 0)) for root_id in dict.fromkeys(root_ids)]
+            yield from (node for node in ready if node is not None)
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.discard(future)
+                    self.requests += 1
+                    node = future.result()
+                    child_entries, node.children = node.children, []
+                    for entry in child_entries:
+                        child_id = entry.get("id")
+                        if not child_id:
+                            continue
+                        node.children.append(child_id)
+                        if child_id in visited:
+                            continue
+                        leaf = visit(TreeNode(child_id, node.id, node.depth + 1, entry.get("name"), entry.get("path")))
+                        if leaf is not None:
+                            yield leaf
+                    yield node
+
+    def walk(self, root_ids: List[str]) -> Dict[str, TreeNode]:
+        '''Maps the whole tree below root_ids, calling on_node for each node as it arrives.'''
+        nodes = {}
+        for node in self.iter_nodes(root_ids):
+            nodes[node.id] = node
+            if self.on_node is not None:
+                self.on_node(node)
+        return nodes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Map the category tree and stream one JSON node per line.")
+    parser.add_argument("roots", nargs='*', help="Root category ids (default: main categories from categories.json)")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--max-depth", type=int)
+    args = parser.parse_args()
+
+    try:
+        roots = args.roots or get_main_category_ids()
+    except ValueError as e:
+        parser.error(str(e))
+    walker = CategoryTreeWalker(args.workers, args.max_depth, on_node=lambda node: print(json.dumps(node.to_dict(), ensure_ascii=False), flush=True))
+    nodes = walker.walk(roots)
+    print(f"{len(nodes)} nodes, {walker.requests} requests", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import argparse
+import json
+import threading
+import time
+from dataclasses import dataclass, field, asdict
+from typing import Optional, Dict, Any, List, Iterator, Callable, Tuple
+from api_client.base_layer import get_deals
+
+_PERCENT_KEYS = ('percentage', 'percent', 'dropPercentage', 'priceDropPercentage', 'value')
+_PREVIOUS_PRICE_KEYS = ('previousPrice', 'oldPrice', 'price')
+
+
+def _amount(value: Any) -> Optional[float]:
+    if isinstance(value, dict):
+        value = value.get("amount")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def deal_price(product: Dict[str, Any]) -> Optional[float]:
+    return _amount(product.get("lowestPrice"))
+
+
+def deal_discount(product: Dict[str, Any]) -> Optional[float]:
+    '''Discount in percent (25.0 = 25% off) from the product's priceDrop, None if unknown.'''
+    drop = product.get("priceDrop")
+    if isinstance(drop, (int, float, str)):
+        value = _amount(drop)
+        return abs(value) if value is not None else None
+    if not isinstance(drop, dict):
+        return None
+    for key in _PERCENT_KEYS:
+        value = _amount(drop.get(key))
+        if value is not None:
+            return abs(value)
+    price = deal_price(product)
+    for key in _PREVIOUS_PRICE_KEYS:
+        previous = _amount(drop.get(key))
+        if previous and price is not None:
+            return round(100 * (previous - price) / previous, 2)
+    return None
+
+
+def _key(product_id: Any) -> Any:
+    product_id = str(product_id)
+    return int(product_id) if product_id.isdigit() else product_id
+
+
+class SeenDeals:
+    '''
+    Product id -> (discount, price, expiry). Ids are stored as ints and entries expire
+    ttl seconds after they were last seen, so a deal that disappears and comes back
+    later is reported again.
+    '''
+
+    def __init__(self, ttl: float = 24 * 3600):
+        self.ttl = ttl
+        self._entries: Dict[Any, Tuple[float, float, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def check(self, product_id: Any, discount: Optional[float], price: Optional[float], min_improvement: float = 1.0, now: Optional[float] = None) -> Tuple[Optional[str], Optional[float]]:
+        '''Returns ('new' | 'deeper' | None, previous discount) and records the sighting.'''
+        now = time.time() if now is None else now
+        key = _key(product_id)
+        discount = discount if discount is not None else 0.0
+        price = price if price is not None else float('inf')
+        entry = self._entries.get(key)
+        if entry is None or entry[2] < now:
+            self._entries[key] = (discount, price, now + self.ttl)
+            return 'new', None
+        seen_discount, seen_price, _ = entry
+        deeper = discount >= seen_discount + min_improvement or price < seen_price
+        self._entries[key] = (max(discount, seen_discount) if not deeper else discount, min(price, seen_price), now + self.ttl)
+        return ('deeper' if deeper else None), seen_discount
+
+    def purge(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        expired = [key for key, entry in self._entries.items() if entry[2] < now]
+        for key in expired:
+            del self._entries[key]
+        return len(expired)
+
+
+@dataclass
+class DealEvent:
+    kind: str
+    product_id: str
+    name: Optional[str]
+    discount: Optional[float]
+    price: Optional[float]
+    previous_discount: Optional[float] = None
+    seen_at: float = field(default_factory=time.time)
+    product: Dict[str, Any] = field(default_factory=dict, repr=False)
+
+    def __str__(self):
+        return f"DealEvent(kind={self.kind}, product_id={self.product_id}, discount={self.discount}, price={self.price})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class ScanStats:
+    polls: int = 0
+    requests: int = 0
+    events: int = 0
+
+    def __str__(self):
+        return f"ScanStats(polls={self.polls}, requests={self.requests}, events={self.events})"
+
+
+class DealScanner:
+    '''
+    Polls the deals endpoint and reports only deals that are new or got deeper since they
+    were last seen. A poll pages forward until a page brings nothing new, so a quiet poll
+    costs one request; every full_scan_every polls the pages are read up to max_pages to
+    catch changes deeper in the listing. A transport response cache with a TTL longer
+    than the poll interval would hide changes, so run the scanner without one.
+    '''
+
+    def __init__(self, price_drop: str = "-90_-10", page_size: int = 50, filters: str = "", sorting: str = "",
+                 ttl: float = 24 * 3600, min_improvement: float = 1.0, max_pages: int = 20, full_scan_every: int = 60,
+                 on_deal: Optional[Callable[[DealEvent], None]] = None):
+        self.price_drop = price_drop
+        self.page_size = page_size
+        self.filters = filters
+        self.additional_params = f"&sorting={sorting}" if sorting else ""
+        self.seen = SeenDeals(ttl)
+        self.min_improvement = min_improvement
+        self.max_pages = max_pages
+        self.full_scan_every = full_scan_every
+        self.on_deal = on_deal
+        self.stats = ScanStats()
+
+    def _events(self, products: List[Dict[str, Any]], now: float) -> List[DealEvent]:
+        events = []
+        for product in products:
+            product_id = product.get("id")
+            if product_id is None:
+                continue
+            discount, price = deal_discount(product), deal_price(product)
+            kind, previous = self.seen.check(product_id, discount, price, self.min_improvement, now)
+            if kind:
+                events.append(DealEvent(kind, str(product_id), product.get("name"), discount, price, previous, now, product))
+        return events
+
+    def poll(self, full: bool = False) -> List[DealEvent]:
+        now = time.time()
+        self.stats.polls += 1
+        events = []
+        offset = 0
+        for _ in range(self.max_pages):
+            data = get_deals(self.page_size, self.price_drop, self.filters, f"{self.additional_params}&offset={offset}")
+            self.stats.requests += 1
+            products = (data or {}).get("products", [])
+            page_events = self._events(products, now)
+            events += page_events
+            offset += len(products)
+            if not products or offset >= data.get("totalProductHits", 0) or (not full and not page_events):
+                break
+        self.stats.events += len(events)
+        if self.on_deal is not None:
+            for event in events:
+                self.on_deal(event)
+        return events
+
+    def stream(self, interval: float = 5.0, stop: Optional[threading.Event] = None) -> Iterator[DealEvent]:
+        '''Polls every `interval` seconds until `stop` is set, yielding events as they are found.'''
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            started = time.monotonic()
+            full = self.stats.polls % self.full_scan_every == 0
+            yield from self.poll(full)
+            if full:
+                self.seen.purge()
+            stop.wait(max(0.0, interval - (time.monotonic() - started)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream new and deeper price drops as NDJSON.")
+    parser.add_argument("--price-drop", default="-90_-10", help="Discount range, '-90_-25' = 25-90%% off")
+    parser.add_argument("--filters", default="", help="Extra af_ filters, e.g. af_BRAND=509")
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds between polls")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--full-scan-every", type=int, default=60, help="Polls between full scans")
+    args = parser.parse_args()
+
+    scanner = DealScanner(args.price_drop, args.page_size, args.filters, full_scan_every=args.full_scan_every)
+    try:
+        for event in scanner.stream(args.interval):
+            event = event.to_dict()
+            event.pop("product")
+            print(json.dumps(event, ensure_ascii=False), flush=True)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, List, Iterable, Callable
+from api_client.base_layer import BASE_API_URL, IncompleteListing, get_category_data, iter_product_pages, get_main_category_ids
+from models.product import Product
+from services.catalog_export import JsonlPartitionWriter
+from transport import http_client
+
+# Task kinds: a category ('t' id) is expanded into its children, a subcategory ('cl' id)
+# is paged into a partition file, and a probe checks whether a 't' id exists at all
+# (the id-range scan of utils/retrieve_categories.fetch_data).
+CATEGORY, SUBCATEGORY, PROBE = 'category', 'subcategory', 'probe'
+PENDING, LEASED, DONE, DEAD = 'pending', 'leased', 'done', 'dead'
+
+
+@dataclass
+class Task:
+    id: str
+    kind: str
+    attempts: int = 0
+
+
+class LeaseLost(Exception):
+    '''The worker's lease expired and the task was handed to another worker.'''
+
+
+class WorkQueue(ABC):
+    '''
+    Shared crawl work queue. Task ids are unique, so adding an id twice is a no-op.
+    A leased task is invisible to other workers until its lease runs out; a worker that
+    crashes simply lets the lease expire and the task is leased again, until an expired lease
+    has used up max_attempts and the task is marked dead. complete, fail and extend only succeed for the worker currently holding the lease. Implement this for
+    other backends (e.g. Redis: a hash per task plus a sorted set of lease deadlines).
+    '''
+
+    @abstractmethod
+    def add(self, task_ids: Iterable[str], kind: str) -> int:
+        '''Returns the number of ids that were not queued before.'''
+
+    @abstractmethod
+    def lease(self, worker_id: str, count: int = 1, lease_seconds: float = 300) -> List[Task]:
+        pass
+
+    @abstractmethod
+    def extend(self, task_id: str, worker_id: str, lease_seconds: float = 300) -> bool:
+        pass
+
+    @abstractmethod
+    def complete(self, task_id: str, worker_id: str, result: Optional[Dict[str, Any]] = None) -> bool:
+        pass
+
+    @abstractmethod
+    def fail(self, task_id: str, worker_id: str, error: str) -> bool:
+        '''Requeues with backoff, or marks the task dead after max_attempts.'''
+
+    @abstractmethod
+    def counts(self) -> Dict[str, int]:
+        '''Number of tasks per state.'''
+
+    @abstractmethod
+    def results(self, kind: str) -> Iterable[Dict[str, Any]]:
+        pass
+
+    def drained(self) -> bool:
+        counts = self.counts()
+        return not counts.get(PENDING) and not counts.get(LEASED)
+
+
+class SQLiteWorkQueue(WorkQueue):
+    '''WorkQueue in one SQLite file (WAL) shared by worker processes on the same machine.'''
+
+    def __init__(self, path: str = 'crawl_queue.db', max_attempts: int = 5, backoff: float = 30.0):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS tasks (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                owner TEXT,
+                lease_until REAL NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                result TEXT
+            );
+            CREATE INDEX IF NOT EXISTS tasks_ready ON tasks (state, available_at);
+        ''')
+        self._lock = threading.Lock()
+
+    def _transaction(self, function: Callable[[], Any]) -> Any:
+        with self._lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                result = function()
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+            return result
+
+    def add(self, task_ids: Iterable[str], kind: str) -> int:
+        rows = [(task_id, kind) for task_id in dict.fromkeys(task_ids)]
+
+        def insert():
+            before = self.conn.total_changes
+            self.conn.executemany('INSERT OR IGNORE INTO tasks (id, kind) VALUES (?, ?)', rows)
+            return self.conn.total_changes - before
+        return self._transaction(insert)
+
+    def lease(self, worker_id: str, count: int = 1, lease_seconds: float = 300) -> List[Task]:
+        def take():
+            now = time.time()
+            # A lease that expired on its last attempt means the task keeps killing its workers.
+            self.conn.execute(
+                '''UPDATE tasks SET state = 'dead', owner = NULL, error = COALESCE(error, 'lease expired on every attempt')
+                   WHERE state = 'leased' AND lease_until < ? AND attempts >= ?''',
+                (now, self.max_attempts),
+            )
+            rows = self.conn.execute(
+                '''SELECT id, kind, attempts FROM tasks
+                   WHERE (state = 'pending' AND available_at <= ?) OR (state = 'leased' AND lease_until < ?)
+                   ORDER BY available_at LIMIT ?''',
+                (now, now, count),
+            ).fetchall()
+            self.conn.executemany(
+                "UPDATE tasks SET state = 'leased', owner = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                [(worker_id, now + lease_seconds, row[0]) for row in rows],
+            )
+            return [Task(task_id, kind, attempts + 1) for task_id, kind, attempts in rows]
+        return self._transaction(take)
+
+    def _owned_update(self, sql: str, params: tuple) -> bool:
+        return self._transaction(lambda: self.conn.execute(sql, params).rowcount == 1)
+
+    def extend(self, task_id: str, worker_id: str, lease_seconds: float = 300) -> bool:
+        return self._owned_update(
+            "UPDATE tasks SET lease_until = ? WHERE id = ? AND owner = ? AND state = 'leased'",
+            (time.time() + lease_seconds, task_id, worker_id),
+        )
+
+    def complete(self, task_id: str, worker_id: str, result: Optional[Dict[str, Any]] = None) -> bool:
+        return self._owned_update(
+            "UPDATE tasks SET state = 'done', result = ?, error = NULL WHERE id = ? AND owner = ? AND state = 'leased'",
+            (json.dumps(result, ensure_ascii=False) if result is not None else None, task_id, worker_id),
+        )
+
+    def fail(self, task_id: str, worker_id: str, error: str) -> bool:
+        def requeue():
+            row = self.conn.execute("SELECT attempts FROM tasks WHERE id = ? AND owner = ? AND state = 'leased'", (task_id, worker_id)).fetchone()
+            if row is None:
+                return False
+            state = DEAD if row[0] >= self.max_attempts else PENDING
+            self.conn.execute(
+                'UPDATE tasks SET state = ?, error = ?, available_at = ?, owner = NULL WHERE id = ?',
+                (state, error, time.time() + self.backoff * 2 ** (row[0] - 1), task_id),
+            )
+            return True
+        return self._transaction(requeue)
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.conn.execute('SELECT state, COUNT(*) FROM tasks GROUP BY state').fetchall())
+
+    def results(self, kind: str) -> Iterable[Dict[str, Any]]:
+        with self._lock:
+            rows = self.conn.execute("SELECT result FROM tasks WHERE kind = ? AND state = 'done' AND result IS NOT NULL ORDER BY id", (kind,)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def close(self):
+        self.conn.close()
+
+
+def seed(queue: WorkQueue, root_ids: List[str]) -> int:
+    '''Queues categories and subcategories to crawl.'''
+    return queue.add([i for i in root_ids if not i.startswith('cl')], CATEGORY) + queue.add([i for i in root_ids if i.startswith('cl')], SUBCATEGORY)
+
+
+def seed_range(queue: WorkQueue, start: int, end: int) -> int:
+    '''Queues probes for t<start>..t<end>, split between workers instead of scanned serially.'''
+    return queue.add((f"t{i}" for i in range(start, end + 1)), PROBE)
+
+
+@dataclass
+class WorkerStats:
+    tasks: int = 0
+    failed: int = 0
+    lost: int = 0
+    pages: int = 0
+    products: int = 0
+
+    def __str__(self):
+        return f"WorkerStats(tasks={self.tasks}, failed={self.failed}, lost={self.lost}, pages={self.pages}, products={self.products})"
+
+
+class CrawlWorker:
+    '''
+    Leases tasks until the queue is drained. Category tasks queue their children, so any
+    worker can seed the whole tree; subcategory tasks write a partition like
+    CatalogExporter (temporary file renamed only once every page was fetched, removed
+    otherwise) and extend their lease after every page. Each worker is a separate process with its own upstream rate limit budget.
+    '''
+
+    def __init__(self, queue: WorkQueue, output_dir: str, worker_id: Optional[str] = None, page_size: int = 100, lease_seconds: float = 300, idle_wait: float = 5.0):
+        self.queue = queue
+        self.output_dir = output_dir
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.page_size = page_size
+        self.lease_seconds = lease_seconds
+        self.idle_wait = idle_wait
+        self.stats = WorkerStats()
+        self.handlers = {CATEGORY: self._category, SUBCATEGORY: self._subcategory, PROBE: self._probe}
+
+    def _category(self, task: Task) -> Dict[str, Any]:
+        data = get_category_data(task.id)
+        if data is None:
+            raise ValueError(f"No hierarchy data for {task.id}")
+        children = [child.get("id") for child in data.get("categories") or [] if isinstance(child, dict) and child.get("id")]
+        seed(self.queue, children)
+        return {"id": task.id, "name": data.get("name"), "path": data.get("path"), "children": children}
+
+    def _probe(self, task: Task) -> Optional[Dict[str, Any]]:
+        '''None for an id that does not exist (a 4xx answer); transport errors and 5xx/429 are retried.'''
+        try:
+            data = json.loads(http_client.fetch(f"{BASE_API_URL}/navigation/menu/DK/hierarchy/{task.id}"))
+        except http_client.RequestException as e:
+            status = getattr(getattr(e, 'response', None), 'status_code', None)
+            if status is not None and 400 <= status < 500 and status != 429:
+                return None
+            raise
+        if not isinstance(data, dict):
+            return None
+        extracted = {"id": data.get("id"), "name": data.get("name"), "path": data.get("path")}
+        return extracted if all(extracted.values()) else None
+
+    def _subcategory(self, task: Task) -> Dict[str, Any]:
+        directory = os.path.join(self.output_dir, f"subcategory={task.id}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, JsonlPartitionWriter.suffix)
+        tmp_path = f"{path}.{self.worker_id}.tmp"
+        writer = JsonlPartitionWriter(tmp_path, task.id)
+        products = fetched = total = 0
+        try:
+            for page in iter_product_pages(task.id.replace('cl', ''), self.page_size):
+                fetched += len(page.get("products", []))
+                total = page.get("totalProductHits", 0)
+                decoded = []
+                for data in page.get("products", []):
+                    try:
+                        decoded.append(Product.from_dict(data))
+                    except (KeyError, TypeError) as e:
+                        print(f"Warning: Could not decode product {data.get('id')}. Exception: {e!r}")
+                writer.write(decoded)
+                products += len(decoded)
+                self.stats.pages += 1
+                if not self.queue.extend(task.id, self.worker_id, self.lease_seconds):
+                    raise LeaseLost(task.id)
+            if fetched < total:
+                raise IncompleteListing(task.id.replace('cl', ''), fetched, total)
+        except BaseException:
+            writer.close()
+            os.remove(tmp_path)
+            raise
+        writer.close()
+        os.replace(tmp_path, path)
+        self.stats.products += products
+        return {"id": task.id, "products": products}
+
+    def run_once(self) -> bool:
+        '''Processes one task; False if none was available.'''
+        tasks = self.queue.lease(self.worker_id, 1, self.lease_seconds)
+        if not tasks:
+            return False
+        task = tasks[0]
+        try:
+            result = self.handlers[task.kind](task)
+        except LeaseLost:
+            self.stats.lost += 1
+            return True
+        except Exception as e:
+            self.stats.failed += 1
+            print(f"Warning: {task.kind} {task.id} failed (attempt {task.attempts}). Exception: {e!r}")
+            self.queue.fail(task.id, self.worker_id, repr(e))
+            return True
+        if not self.queue.complete(task.id, self.worker_id, result):
+            self.stats.lost += 1
+        self.stats.tasks += 1
+        return True
+
+    def run(self, stop: Optional[threading.Event] = None) -> WorkerStats:
+        '''Works until the queue has nothing pending or leased (or stop is set).'''
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            if not self.run_once():
+                if self.queue.drained():
+                    break
+                stop.wait(self.idle_wait)
+        return self.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distributed category/product crawl over a shared, leased work queue.")
+    parser.add_argument("--db", default='crawl_queue.db', help="SQLite work queue shared by all workers")
+    commands = parser.add_subparsers(dest='command', required=True)
+    seed_parser = commands.add_parser('seed', help="Queue root categories/subcategories or a t-id range to probe")
+    seed_parser.add_argument("roots", nargs='*', help="Category or subcategory ids (default: main categories from categories.json)")
+    seed_parser.add_argument("--range", nargs=2, type=int, metavar=('START', 'END'), help="Probe t<START>..t<END> instead")
+    work_parser = commands.add_parser('work', help="Run one worker until the queue is drained")
+    work_parser.add_argument("output_dir")
+    work_parser.add_argument("--worker-id")
+    work_parser.add_argument("--lease", type=float, default=300)
+    commands.add_parser('status', help="Task counts per state")
+    probes_parser = commands.add_parser('probes', help="Write the categories found by probes to a JSON file")
+    probes_parser.add_argument("output_file", nargs='?', default='output.json')
+    args = parser.parse_args()
+
+    roots = None
+    if args.command == 'seed' and not args.range:
+        try:
+            roots = args.roots or get_main_category_ids()
+        except ValueError as e:
+            parser.error(str(e))
+    queue = SQLiteWorkQueue(args.db)
+    if args.command == 'seed':
+        if args.range:
+            print(f"{seed_range(queue, *args.range)} probes queued")
+        else:
+            print(f"{seed(queue, roots)} tasks queued")
+    elif args.command == 'work':
+        print(CrawlWorker(queue, args.output_dir, args.worker_id, lease_seconds=args.lease).run())
+    elif args.command == 'status':
+        print(queue.counts())
+    elif args.command == 'probes':
+        with open(args.output_file, 'w', encoding='utf-8') as f:
+            json.dump(list(queue.results(PROBE)), f, ensure_ascii=False, indent=4)
+    queue.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import math
+from bisect import bisect_left, bisect_right
+from typing import Optional, Dict, Any, List, Iterable, Tuple
+from api_client.base_layer import get_filters
+from services.local_query import (
+    ListingCache, CachedListing, UnsupportedQuery, RANGE_FIELDS, OPTION_FIELDS,
+    filter_hit_values, parse_range, _number,
+)
+from services.model_layer import Filter, FilterOption
+
+
+def _mask(indices: Iterable[int], size: int) -> int:
+    '''Bitset with one bit per product index.'''
+    bits = bytearray((size + 7) // 8)
+    for index in indices:
+        bits[index >> 3] |= 1 << (index & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def _interval(low: float, high: float) -> str:
+    # repr round-trips, so the interval parses back to exactly these bounds.
+    return f"{low!r}_{high!r}"
+
+
+class _OptionColumn:
+    def __init__(self, masks: Dict[str, int]):
+        self.masks = masks
+
+    def select(self, values: List[str]) -> int:
+        selected = 0
+        for value in values:
+            selected |= self.masks.get(value, 0)
+        return selected
+
+
+class _NumericColumn:
+    '''(value, product index) pairs sorted by value; a range is a contiguous slice.'''
+
+    def __init__(self, pairs: List[Tuple[float, int]], size: int):
+        pairs.sort()
+        self.values = [value for value, _ in pairs]
+        self.indices = [index for _, index in pairs]
+        self.size = size
+        self._ranges: Dict[Tuple[float, float], int] = {}
+
+    def range_mask(self, low: float, high: float) -> int:
+        mask = self._ranges.get((low, high))
+        if mask is None:
+            start, stop = bisect_left(self.values, low), bisect_right(self.values, high)
+            mask = self._ranges[(low, high)] = _mask(self.indices[start:stop], self.size)
+        return mask
+
+    def select(self, values: List[str]) -> int:
+        selected = 0
+        for value in values:
+            selected |= self.range_mask(*parse_range(value))
+        return selected
+
+    def bucket_mask(self, low: float, high: float, closed: bool) -> int:
+        '''[low, high), or [low, high] for the last bucket.'''
+        stop = bisect_right(self.values, high) if closed else bisect_left(self.values, high)
+        return _mask(self.indices[bisect_left(self.values, low):stop], self.size)
+
+    def bounds(self, mask: int) -> Tuple[Optional[float], Optional[float]]:
+        low = next((value for value, index in zip(self.values, self.indices) if mask >> index & 1), None)
+        high = next((value for value, index in zip(reversed(self.values), reversed(self.indices)) if mask >> index & 1), None)
+        return low, high
+
+
+class FacetEngine:
+    '''
+    Facet counts for a crawled subcategory, computed locally for any combination of active
+    filters. Every option and range is a bitset over the products, so a count is an AND of
+    the other active filters' bitsets plus a popcount. As in faceted navigation upstream,
+    the counts of a filter ignore that filter's own selection.
+    '''
+
+    def __init__(self, products: List[Dict[str, Any]], filter_types: Dict[str, str]):
+        self.products = products
+        self.filter_types = dict(filter_types)
+        self.all = (1 << len(products)) - 1
+        self.columns: Dict[str, Any] = {}
+        for filter_id, filter_type in self.filter_types.items():
+            if filter_type == 'OPTIONS':
+                self.columns[filter_id] = self._option_column(filter_id)
+            elif filter_type in ('RANGE', 'INTERVAL'):
+                self.columns[filter_id] = self._numeric_column(filter_id)
+
+    @classmethod
+    def from_listing(cls, listing: CachedListing, filter_types: Dict[str, str]) -> 'FacetEngine':
+        '''Raises UnsupportedQuery for an incomplete listing, whose counts would be wrong.'''
+        if not listing.complete:
+            raise UnsupportedQuery(f"No complete cached listing for {listing.subcategory_id}; use get_filter_data upstream")
+        return cls(listing.products, filter_types)
+
+    @classmethod
+    def from_subcategory(cls, subcategory_id: str, cache: Optional[ListingCache] = None) -> 'FacetEngine':
+        '''
+        Builds from the cached listing (loading it if needed) and the subcategory's filter list.
+        Raises UnsupportedQuery if the listing is too large for the cache or could not be loaded.
+        '''
+        cache = cache or ListingCache()
+        if cache.is_too_large(subcategory_id):
+            raise UnsupportedQuery(f"{subcategory_id} is larger than the listing cache allows; use get_filter_data upstream")
+        listing = cache.get(subcategory_id) or cache.load(subcategory_id)
+        if not listing.complete:
+            raise UnsupportedQuery(f"No complete cached listing for {subcategory_id}; use get_filter_data upstream")
+        filter_types = {data.get("id"): data.get("type") for data in get_filters(subcategory_id.replace('cl', '')) or []}
+        return cls.from_listing(listing, filter_types)
+
+    def _option_column(self, filter_id: str) -> _OptionColumn:
+        read = OPTION_FIELDS.get(filter_id, lambda product: filter_hit_values(product, filter_id) or set())
+        indices: Dict[str, List[int]] = {}
+        for index, product in enumerate(self.products):
+            for value in read(product):
+                indices.setdefault(value, []).append(index)
+        return _OptionColumn({value: _mask(rows, len(self.products)) for value, rows in indices.items()})
+
+    def _numeric_column(self, filter_id: str) -> _NumericColumn:
+        pairs = []
+        for index, product in enumerate(self.products):
+            if filter_id in RANGE_FIELDS:
+                values = [RANGE_FIELDS[filter_id](product)]
+            else:
+                values = [_number(value) for value in filter_hit_values(product, filter_id) or ()]
+            pairs += [(value, index) for value in values if not math.isnan(value)]
+        return _NumericColumn(pairs, len(self.products))
+
+    def match_mask(self, active: Optional[List[Filter]] = None, exclude: Optional[str] = None) -> int:
+        '''Bitset of the products matching every active filter except `exclude`.'''
+        mask = self.all
+        for active_filter in active or []:
+            values = [str(option.value) for option in active_filter.options]
+            if active_filter.id == exclude or not values:
+                continue
+            column = self.columns.get(active_filter.id)
+            if column is None:
+                raise UnsupportedQuery(f"Filter {active_filter.id} is not indexed for this subcategory")
+            mask &= column.select(values)
+        return mask
+
+    def count(self, active: Optional[List[Filter]] = None) -> int:
+        return self.match_mask(active).bit_count()
+
+    def matching_products(self, active: Optional[List[Filter]] = None) -> List[Dict[str, Any]]:
+        mask = self.match_mask(active)
+        return [product for index, product in enumerate(self.products) if mask >> index & 1]
+
+    def facet(self, filter_id: str, active: Optional[List[Filter]] = None, intervals: Optional[List[str]] = None) -> Dict[str, Any]:
+        '''
+        Same shape as the "facet" of get_filter_data: "counts" for OPTIONS, "min"/"max" for RANGE,
+        "intervalCounts" for INTERVAL: the given intervals, counted inclusively like a filter
+        selection, or ten equal-width buckets [low, high) whose last one includes the maximum,
+        so every product is counted exactly once.
+        '''
+        column = self.columns.get(filter_id)
+        if column is None:
+            raise UnsupportedQuery(f"Filter {filter_id} is not indexed for this subcategory")
+        filter_type = self.filter_types[filter_id]
+        mask = self.match_mask(active, exclude=filter_id)
+        data: Dict[str, Any] = {"id": filter_id, "type": filter_type, "productCount": mask.bit_count()}
+        if filter_type == 'OPTIONS':
+            counts = [(value, (option_mask & mask).bit_count()) for value, option_mask in column.masks.items()]
+            data["counts"] = [{"optionId": value, "count": count} for value, count in sorted(counts, key=lambda item: -item[1]) if count]
+        elif filter_type == 'RANGE':
+            data["min"], data["max"] = column.bounds(mask)
+        else:
+            if intervals is None:
+                edges = self._bucket_edges(filter_id)
+                buckets = list(zip(edges, edges[1:]))
+                data["intervalCounts"] = [
+                    {"interval": _interval(low, high), "count": (column.bucket_mask(low, high, i == len(buckets) - 1) & mask).bit_count()}
+                    for i, (low, high) in enumerate(buckets)
+                ]
+            else:
+                data["intervalCounts"] = [{"interval": interval, "count": (column.select([interval]) & mask).bit_count()} for interval in intervals]
+        return data
+
+    def facets(self, active: Optional[List[Filter]] = None) -> Dict[str, Dict[str, Any]]:
+        return {filter_id: self.facet(filter_id, active) for filter_id in self.columns}
+
+    def get_options(self, filter_id: str, active: Optional[List[Filter]] = None) -> List[FilterOption]:
+        '''Local counterpart of Filter.get_options.'''
+        data = self.facet(filter_id, active)
+        return [FilterOption.from_dict(option, data["type"]) for key in Filter.option_keys for option in data.get(key, [])]
+
+    def _bucket_edges(self, filter_id: str, buckets: int = 10) -> List[float]:
+        '''buckets + 1 equal-width edges from the minimum to exactly the maximum.'''
+        column = self.columns[filter_id]
+        if not column.values:
+            return []
+        low, high = column.values[0], column.values[-1]
+        if low == high:
+            return [low, high]
+        width = (high - low) / buckets
+        return [low + i * width for i in range(buckets)] + [high]
+
+    def default_intervals(self, filter_id: str, buckets: int = 10) -> List[str]:
+        edges = self._bucket_edges(filter_id, buckets)
+        return [_interval(low, high) for low, high in zip(edges, edges[1:])]
@@ -0,0 +1,224 @@
+import math
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, Callable, Union
+from urllib.parse import unquote
+from api_client.base_layer import IncompleteListing, get_products, iter_product_pages
+from services.model_layer import Filter, SubCategory
+
+_RANGE = re.compile(r'(_|-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)?[_-](_|-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)?')
+
+
+class UnsupportedQuery(Exception):
+    '''A filter or sorting preset that cannot be evaluated against cached products.'''
+
+
+def _number(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _price(product: Dict[str, Any]) -> float:
+    return _number((product.get("lowestPrice") or {}).get("amount"))
+
+
+def _rank(product: Dict[str, Any]) -> float:
+    return _number((product.get("rank") or {}).get("rank"))
+
+
+def _rating(product: Dict[str, Any]) -> float:
+    return _number((product.get("rating") or {}).get("average"))
+
+
+def _brand_ids(product: Dict[str, Any]) -> set:
+    return {str((product.get("brand") or {}).get("id"))}
+
+
+def _merchant_ids(product: Dict[str, Any]) -> set:
+    ids = {str(merchant.get("id")) for merchant in (product.get("previewMerchants") or {}).get("merchants", [])}
+    merchant = ((product.get("cheapestOffer") or {}).get("merchant") or {}).get("id")
+    if merchant is not None:
+        ids.add(str(merchant))
+    return ids
+
+
+def filter_hit_values(product: Dict[str, Any], filter_id: str) -> Optional[set]:
+    '''Option ids/values of one attribute filter from a product's filterHits, None if absent.'''
+    for hit in product.get("filterHits") or []:
+        if not isinstance(hit, dict) or str(hit.get("id", hit.get("filterId"))) != filter_id:
+            continue
+        values = set()
+        for key in ('optionId', 'optionIds', 'value', 'values'):
+            value = hit.get(key)
+            if isinstance(value, list):
+                values.update(str(item) for item in value)
+            elif value is not None:
+                values.add(str(value))
+        return values
+    return None
+
+
+# Built-in filters evaluated on listing fields; anything else is looked up in filterHits.
+RANGE_FIELDS = {'PRICE': _price, 'RATING': _rating}
+OPTION_FIELDS = {'BRAND': _brand_ids, 'MERCHANT': _merchant_ids}
+
+# Sort keys per sorting preset, ascending; PRICE_DROP is left to upstream.
+SORTING_KEYS: Dict[str, Callable[[Dict[str, Any]], float]] = {
+    'RANK_desc': _rank,
+    'RANK_asc': lambda product: -_rank(product),
+    'PRICE_asc': _price,
+    'PRICE_desc': lambda product: -_price(product),
+}
+
+
+def parse_range(value: str) -> tuple:
+    '''"100_1900" -> (100.0, 1900.0); "_" marks an open end, as in FilterOption.from_range.'''
+    match = _RANGE.fullmatch(unquote(str(value)))
+    if not match:
+        raise UnsupportedQuery(f"Cannot parse range '{value}'")
+    low, high = match.groups()
+    return (-math.inf if low in (None, '_') else float(low)), (math.inf if high in (None, '_') else float(high))
+
+
+def compile_filter(filter: Filter) -> Callable[[Dict[str, Any]], bool]:
+    '''Predicate equivalent to filter.get_query(), or UnsupportedQuery.'''
+    values = [str(option.value) for option in filter.options]
+    if not values:
+        return lambda product: True
+    if filter.type in ('RANGE', 'INTERVAL'):
+        low, high = parse_range(values[0])
+        if filter.id in RANGE_FIELDS:
+            read = RANGE_FIELDS[filter.id]
+            return lambda product: low <= read(product) <= high
+
+        def in_range(product: Dict[str, Any]) -> bool:
+            hits = filter_hit_values(product, filter.id)
+            if hits is None:
+                return False
+            return any(low <= _number(hit) <= high for hit in hits)
+        return in_range
+    if filter.type == 'OPTIONS':
+        wanted = set(values)
+        if filter.id in OPTION_FIELDS:
+            read = OPTION_FIELDS[filter.id]
+            return lambda product: bool(read(product) & wanted)
+        return lambda product: bool((filter_hit_values(product, filter.id) or set()) & wanted)
+    raise UnsupportedQuery(f"Unsupported filter type '{filter.type}' for {filter.id}")
+
+
+@dataclass
+class CachedListing:
+    subcategory_id: str
+    products: List[Dict[str, Any]] = field(default_factory=list)
+    total: Optional[int] = None
+    loaded_at: float = 0.0
+    too_large: bool = False
+
+    @property
+    def complete(self) -> bool:
+        '''False while the total is unknown, e.g. after a failed first page.'''
+        return self.total is not None and len(self.products) >= self.total
+
+
+class ListingCache:
+    '''
+    Fully paged, unfiltered subcategory listings with a TTL. Subcategories over max_products
+    are remembered as too large for the same TTL, so they are not paged again on every query.
+    '''
+
+    def __init__(self, ttl: float = 300.0, page_size: int = 100, max_products: int = 20000):
+        self.ttl = ttl
+        self.page_size = page_size
+        self.max_products = max_products
+        self._listings: Dict[str, CachedListing] = {}
+        self._lock = threading.Lock()
+
+    def get(self, subcategory_id: str) -> Optional[CachedListing]:
+        '''The cached listing if it is fresh and complete.'''
+        listing = self._listings.get(subcategory_id)
+        if listing is None or not listing.complete or time.time() - listing.loaded_at > self.ttl:
+            return None
+        return listing
+
+    def is_too_large(self, subcategory_id: str) -> bool:
+        listing = self._listings.get(subcategory_id)
+        return listing is not None and listing.too_large and time.time() - listing.loaded_at <= self.ttl
+
+    def load(self, subcategory_id: str) -> CachedListing:
+        '''Pages through the subcategory; the result is incomplete if a page fails or it is too large.'''
+        listing = CachedListing(subcategory_id, loaded_at=time.time())
+        try:
+            for page in iter_product_pages(subcategory_id.replace('cl', ''), self.page_size):
+                total = page.get("totalProductHits", 0)
+                if total > self.max_products:
+                    listing.too_large = True
+                    break
+                listing.products.extend(page.get("products", []))
+            else:
+                listing.total = len(listing.products)
+        except IncompleteListing as e:
+            print(f"Warning: {e}; {subcategory_id} is queried upstream until it loads in full.")
+        with self._lock:
+            self._listings[subcategory_id] = listing
+        return listing
+
+    def invalidate(self, subcategory_id: str):
+        with self._lock:
+            self._listings.pop(subcategory_id, None)
+
+
+class LocalQueryEngine:
+    '''
+    Evaluates Filter constraints and sorting presets against a cached, fully paged
+    subcategory. Goes upstream (search/category/v3 with the same query) only when the
+    cache is stale or incomplete, the subcategory is larger than the cache allows, or
+    the query uses something that cannot be evaluated locally.
+    '''
+
+    def __init__(self, cache: Optional[ListingCache] = None, load_missing: bool = True):
+        self.cache = cache or ListingCache()
+        self.load_missing = load_missing
+        self.local_queries = 0
+        self.upstream_queries = 0
+
+    def _local(self, subcategory_id: str) -> Optional[CachedListing]:
+        listing = self.cache.get(subcategory_id)
+        if listing is None and self.load_missing and not self.cache.is_too_large(subcategory_id):
+            listing = self.cache.load(subcategory_id)
+            if not listing.complete:
+                return None
+        return listing
+
+    def get_products(self, subcategory: Union[SubCategory, str], filters: List[Filter] = None, size: int = 10, only_in_stuck: bool = False, sorting: str = 'RANK_desc', price_drop: str = '') -> List[Dict[str, Any]]:
+        '''Same arguments as SubCategory.get_product_ids; returns the raw product dicts.'''
+        subcategory_id = subcategory.id if isinstance(subcategory, SubCategory) else subcategory
+        filters = filters or []
+        try:
+            if only_in_stuck or price_drop or sorting not in SORTING_KEYS:
+                raise UnsupportedQuery(f"Cannot evaluate sorting={sorting}, only_in_stuck={only_in_stuck}, price_drop={price_drop} locally")
+            predicates = [compile_filter(f) for f in filters]
+            listing = self._local(subcategory_id)
+            if listing is None:
+                raise UnsupportedQuery(f"No complete cached listing for {subcategory_id}")
+        except UnsupportedQuery:
+            self.upstream_queries += 1
+            return self._upstream(subcategory_id, filters, size, only_in_stuck, sorting, price_drop)
+
+        self.local_queries += 1
+        matches = [product for product in listing.products if all(predicate(product) for predicate in predicates)]
+        key = SORTING_KEYS[sorting]
+        matches.sort(key=lambda product: (math.isnan(key(product)), key(product)))
+        return matches[:size]
+
+    def get_product_ids(self, subcategory: Union[SubCategory, str], filters: List[Filter] = None, size: int = 10, only_in_stuck: bool = False, sorting: str = 'RANK_desc', price_drop: str = '') -> List[str]:
+        return [product.get("id") for product in self.get_products(subcategory, filters, size, only_in_stuck, sorting, price_drop)]
+
+    def _upstream(self, subcategory_id: str, filters: List[Filter], size: int, only_in_stuck: bool, sorting: str, price_drop: str) -> List[Dict[str, Any]]:
+        filter_query = '&'.join(f.get_query() for f in filters)
+        additional_params = f"&af_ONLY_IN_STOCK={only_in_stuck}&sorting={sorting}&af_PRICE_DROP={price_drop}"
+        data = get_products(subcategory_id.replace('cl', ''), size, filter_query, additional_params) or {}
+        return data.get("products", [])
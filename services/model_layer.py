@@ -1,9 +1,13 @@
 from dataclasses import dataclass, asdict, field, fields
-import json
-import os
-import requests
-from typing import Optional, Dict, Any, List, Union
-from api_client.base_layer import *
+from typing import Optional, Dict, Any, List, Tuple, Union
+from api_client.base_layer import (
+    get_product_details, get_product_rank, get_product_keywords, get_price_history, get_product_reviews,
+    get_filter_data, get_products, get_filters, get_guiding_content, suggest, search,
+    get_category_data, get_breadcrumbs, get_keywords, get_keywords_sub, get_seo_text,
+    get_popular_products, get_main_categories_from_json, CATEGORIES_FILE,
+)
+from functools import cached_property
+from models import product as listing_product
 import re
 
 BASE_URL = "https://www.pricerunner.dk"
@@ -97,7 +101,54 @@ class ProductService:
         return [Review(**review) for review in get_product_reviews(self.id, count)]
 
     
+@dataclass
+class SearchResult:
+    '''One search/v5 response. Each part is parsed on first access.'''
+    query: str
+    data: Dict[str, Any] = field(default_factory=dict, repr=False)
+
+    def __str__(self):
+        return f"SearchResult(query={self.query})"
+
+    @cached_property
+    def categories(self) -> List['Category']:
+        return [Category(id=category.get("id")) for category in self.data.get("categories", [])]
+
+    @cached_property
+    def products(self) -> List[listing_product.Product]:
+        '''Decoded with models.product.Product.from_dict; products missing required fields are skipped.'''
+        products = []
+        for data in self.data.get("products", []):
+            try:
+                products.append(listing_product.Product.from_dict(data))
+            except (KeyError, TypeError) as e:
+                print(f"Warning: Could not decode product {data.get('id')}. Exception: {e!r}")
+        return products
+
+    @cached_property
+    def suggestions(self) -> List[Dict[str, Any]]:
+        return self.data.get("suggestions", [])
+
+
+def _subcategory_ids(data: Any) -> List[str]:
+    '''Distinct 'cl' ids from every /cl/<id>/ url in a payload, in order of appearance.'''
+    ids = {}
+    stack = [data]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            stack.extend(reversed(list(item.values())))
+        elif isinstance(item, list):
+            stack.extend(reversed(item))
+        elif isinstance(item, str) and 'cl/' in item:
+            for num in re.findall(r'cl/(\d+)/', item):
+                ids[f"cl{int(num)}"] = None
+    return list(ids)
+
+
 class Searcher:
+    DEFAULT_SEARCH_PARAMS = "&suggestionsActive=true&suggestionClicked=false&suggestionReverted=false"
+
     def get_seo_text(self, item: Union['Keyword', 'SubCategory']) -> str:
         if isinstance(item, Keyword):
             id = item.name.replace(" ", "-").lower()
@@ -107,28 +158,25 @@ class Searcher:
         else:
             raise TypeError("Unsupported type provided to get_seo_text")
 
-    def search_categories(self, search_query: str, size: int = 10, additional_params: str = "&suggestionsActive=true&suggestionClicked=false&suggestionReverted=false") -> List['Category']:
-        data = search(search_query, size, additional_params)
-        category_data = data.get("categories", [])  
-        categories = [Category(id=category.get("id")) for category in category_data]
-        return categories
+    def search(self, search_query: str, size: int = 10, additional_params: str = DEFAULT_SEARCH_PARAMS) -> SearchResult:
+        '''Categories, products and suggestions from a single search/v5 request.'''
+        return SearchResult(query=search_query, data=search(search_query, size, additional_params) or {})
+
+    def search_many(self, search_queries: List[str], size: int = 10, additional_params: str = DEFAULT_SEARCH_PARAMS, max_workers: int = 8) -> List[SearchResult]:
+        '''Runs search() for every query with at most max_workers requests in flight. Results keep the input order.'''
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(lambda query: self.search(query, size, additional_params), search_queries))
+
+    def search_categories(self, search_query: str, size: int = 10, additional_params: str = DEFAULT_SEARCH_PARAMS) -> List['Category']:
+        return self.search(search_query, size, additional_params).categories
     
-    def search_products(self, search_query: str, size: int = 10, additional_params: str = "&suggestionsActive=true&suggestionClicked=false&suggestionReverted=false") -> List[Product]:
-        data = search(search_query, size, additional_params)
-        products_data = data.get("products", [])
-        products = [Product(**product) for product in products_data]
-        return products
+    def search_products(self, search_query: str, size: int = 10, additional_params: str = DEFAULT_SEARCH_PARAMS) -> List[listing_product.Product]:
+        return self.search(search_query, size, additional_params).products
 
     def suggest_categories(self, query: str) -> List['SubCategory']:
-        def get_distinct_numbers(text) -> set:
-            pattern = r'cl/(\d+)/'
-            matches = re.findall(pattern, text)
-            distinct_numbers = set(map(int, matches))
-            return distinct_numbers
         data = suggest(query)
-        suggestions_txt  = str(data.get("suggestions", []))
-        distinct_numbers = get_distinct_numbers(suggestions_txt)
-        return [SubCategory(id=f"cl{num}") for num in distinct_numbers]
+        return [SubCategory(id=id) for id in _subcategory_ids(data.get("suggestions", []))]
 
     def suggest_products(self, query: str) -> List[Product]:
         data = suggest(query)
@@ -162,6 +210,11 @@ class Category:
     
     def get_breadcrumbs(self):
         return get_breadcrumbs(self.id)
+
+    def hydrate(self) -> 'HydratedCategory':
+        '''Keywords, popular products, hierarchy and breadcrumbs fetched concurrently.'''
+        from services.category_hydration import CategoryHydrator
+        return CategoryHydrator().hydrate(self.id)
     
     def get_children_ids(self) -> List[str]:
         return [subcat["id"] for subcat in get_category_data(self.id).get('categories', [])]
@@ -231,9 +284,11 @@ class Filter:
     def __init__(self, id: str, subcategory_id: str, filter_type: str, option: Optional[FilterOption] = None):
         self.id = id
         self.categoryId = subcategory_id
-        self.options = set(option)
+        self.type = filter_type
+        self.options = [option] if option else []
         if filter_type == 'OPTIONS': 
             self.add_option = self._add_option
+            self.set_option = self._add_option
             self.select_option = self._select_option
         elif filter_type == 'RANGE': 
             self.set_range = self._set_range
@@ -253,10 +308,11 @@ class Filter:
         self.set_option(FilterOption(value=f"{from_value}_{to_value}"))
 
     def _add_option(self, option: FilterOption):
-        self.options.add(option)
+        if all(existing.value != option.value for existing in self.options):
+            self.options.append(option)
 
     def _set_option(self, option: FilterOption):
-        self.options = {option}
+        self.options = [option]
     
     def get_options(self) -> List[FilterOption]:
         data = get_filter_data(self.categoryId, self.id).get("facet", {})
@@ -275,7 +331,7 @@ class Filter:
         return data
 
     def get_query(self) -> str:
-        option_values = [option.value for option in self.options]
+        option_values = [str(option.value) for option in self.options]
         joined_values = '%2C'.join(option_values)
         return f'af_{self.id}={joined_values}'
 
@@ -297,11 +353,28 @@ class SubCategory(Category):
         Sorting options: ['RANK_asc', 'RANK_desc', 'PRICE_desc', 'PRICE_asc', 'PRICE_DROP']
         Price drop example '-90_-25' = #25-90% discount
         '''
-        filter_query = '&'.join(f.get_query() + '&' for f in filters)
+        return [product.get("id") for product in self.__query_products(filters, size, only_in_stuck, sorting, price_drop)]
+
+    def get_projected_products(self, fields: Union[str, List[str], 'Projection'], filters: List[Filter] = None, size: int = 10, only_in_stuck: bool = False, sorting: str = 'RANK_desc', price_drop: str = '') -> List[tuple]:
+        '''
+        Only the given fields of each product, e.g. "id, name, lowestPrice.amount, rating.average".
+        See models.projection.Projection.
+        '''
+        from models.projection import Projection
+        projection = fields if isinstance(fields, Projection) else Projection(fields)
+        return projection.project_many(self.__query_products(filters, size, only_in_stuck, sorting, price_drop))
+
+    @staticmethod
+    def get_product_query(filters: Optional[List[Filter]] = None, only_in_stuck: bool = False, sorting: str = 'RANK_desc', price_drop: str = '') -> Tuple[str, str]:
+        '''(filters, additional_params) for get_products, as sent by get_product_ids; shared with the cache warmer.'''
+        filter_query = '&'.join(f.get_query() + '&' for f in filters or [])
         additional_params = f"&af_ONLY_IN_STOCK={only_in_stuck}&sorting={sorting}&af_PRICE_DROP={price_drop}"
+        return filter_query, additional_params
+
+    def __query_products(self, filters: Optional[List[Filter]], size: int, only_in_stuck: bool, sorting: str, price_drop: str) -> List[Dict[str, Any]]:
+        filter_query, additional_params = self.get_product_query(filters, only_in_stuck, sorting, price_drop)
         product_data = get_products(subcategory_id = self.__simple_id(), filters = filter_query, size=size, additional_params=additional_params)
-        products = product_data.get("products", [])
-        return [product.get("id") for product in products]
+        return (product_data or {}).get("products", [])
 
     def get_prodcuts(self, filters: List[Filter] = None, size: int = 10, only_in_stuck: bool = False, sorting: str = 'RANK_desc', price_drop: str = '') -> List[Product]:
         '''
@@ -331,6 +404,6 @@ class SubCategory(Category):
         return get_guiding_content(self.__simple_id(), size)
         
 
-def get_main_categories(json_file: str = 'categories.json') -> List[Category]:
+def get_main_categories(json_file: str = CATEGORIES_FILE) -> List[Category]:
     data = get_main_categories_from_json(json_file)
     return [Category(id=category.get("id"), name=category.get("name")) for category in data]
@@ -0,0 +1,281 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Optional, Dict, Any, List, Iterable, Iterator, Set, NamedTuple
+
+PRICE_DOWN = 'PRICE_DOWN'
+PRICE_UP = 'PRICE_UP'
+NEW_CHEAPEST_MERCHANT = 'NEW_CHEAPEST_MERCHANT'
+BACK_IN_STOCK = 'BACK_IN_STOCK'
+OUT_OF_STOCK = 'OUT_OF_STOCK'
+EVENT_KINDS = (PRICE_DOWN, PRICE_UP, NEW_CHEAPEST_MERCHANT, BACK_IN_STOCK, OUT_OF_STOCK)
+
+
+class ProductState(NamedTuple):
+    price: Optional[float]
+    merchant_id: Optional[str]
+    in_stock: bool
+
+
+@dataclass
+class PriceEvent:
+    kind: str
+    product_id: str
+    old_price: Optional[float]
+    new_price: Optional[float]
+    old_merchant_id: Optional[str]
+    new_merchant_id: Optional[str]
+    at: float
+
+    def __str__(self):
+        return f"PriceEvent(kind={self.kind}, product_id={self.product_id}, {self.old_price} -> {self.new_price})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'PriceEvent':
+        return cls(**data)
+
+
+def _amount(value: Any) -> Optional[float]:
+    if isinstance(value, dict):
+        value = value.get("amount")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _id(value: Any) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def listing_state(product: Dict[str, Any]) -> ProductState:
+    '''State of a product dict from get_products or list_products.'''
+    price = _amount(product.get("lowestPrice"))
+    merchant_id = ((product.get("cheapestOffer") or {}).get("merchant") or {}).get("id")
+    return ProductState(price, _id(merchant_id), price is not None)
+
+
+def offers_state(offers: Any) -> ProductState:
+    '''State from a get_product_offers response: its cheapest offer, out of stock if there is none.'''
+    if isinstance(offers, dict):
+        offers = offers.get("offers", [])
+    priced = [(_amount(offer.get("price")), offer) for offer in offers or [] if isinstance(offer, dict)]
+    priced = [(price, offer) for price, offer in priced if price is not None]
+    if not priced:
+        return ProductState(None, None, False)
+    price, offer = min(priced, key=lambda item: item[0])
+    return ProductState(price, _id(offer.get("merchantId", (offer.get("merchant") or {}).get("id"))), True)
+
+
+def diff_state(product_id: str, old: Optional[ProductState], new: ProductState, at: Optional[float] = None) -> List[PriceEvent]:
+    '''Events between two states of one product; none for a product seen for the first time.'''
+    if old is None or old == new:
+        return []
+    at = time.time() if at is None else at
+    event = lambda kind: PriceEvent(kind, product_id, old.price, new.price, old.merchant_id, new.merchant_id, at)
+    if not new.in_stock:
+        return [event(OUT_OF_STOCK)] if old.in_stock else []
+    if not old.in_stock:
+        return [event(BACK_IN_STOCK)]
+    events = []
+    if old.price is not None and new.price is not None and new.price != old.price:
+        events.append(event(PRICE_DOWN if new.price < old.price else PRICE_UP))
+    if new.merchant_id is not None and new.merchant_id != old.merchant_id:
+        events.append(event(NEW_CHEAPEST_MERCHANT))
+    return events
+
+
+class PriceTracker:
+    '''
+    Last known state per product; update() returns the events since the previous update.
+    With track_changes, every new or changed state is also kept until drain_changes(),
+    including first sightings and changes that raise no event, so they can be persisted.
+    '''
+
+    def __init__(self, track_changes: bool = False):
+        self.states: Dict[str, ProductState] = {}
+        self.track_changes = track_changes
+        self._changes: Dict[str, ProductState] = {}
+
+    def update(self, product_id: str, state: ProductState, at: Optional[float] = None) -> List[PriceEvent]:
+        product_id = str(product_id)
+        old = self.states.get(product_id)
+        events = diff_state(product_id, old, state, at)
+        self.states[product_id] = state
+        if self.track_changes and state != old:
+            self._changes[product_id] = state
+        return events
+
+    def drain_changes(self) -> Dict[str, ProductState]:
+        changes, self._changes = self._changes, {}
+        return changes
+
+    def update_listing(self, data: Any) -> List[PriceEvent]:
+        '''A get_products / list_products response, or its product list.'''
+        products = data.get("products", []) if isinstance(data, dict) else data or []
+        at = time.time()
+        return [event for product in products if product.get("id") is not None for event in self.update(product["id"], listing_state(product), at)]
+
+    def update_offers(self, product_id: str, data: Any) -> List[PriceEvent]:
+        return self.update(product_id, offers_state(data))
+
+
+class EventLog:
+    '''
+    Append-only JSONL of events and of the product states behind them, flushed per batch.
+    replay() yields the events; restore() rebuilds a tracker after a restart from the states,
+    so products that were only seen once still raise events on their next change.
+    '''
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def append(self, events: Iterable[PriceEvent], states: Optional[Dict[str, ProductState]] = None):
+        lines = ''.join(json.dumps({"product_id": product_id, "state": state._asdict()}, ensure_ascii=False) + "\n" for product_id, state in (states or {}).items())
+        lines += ''.join(json.dumps(event.to_dict(), ensure_ascii=False) + "\n" for event in events)
+        if lines:
+            with self._lock:
+                self._file.write(lines)
+                self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def _records(self) -> Iterator[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def replay(self) -> Iterator[PriceEvent]:
+        for record in self._records():
+            if "state" not in record:
+                yield PriceEvent.from_dict(record)
+
+    def restore(self, tracker: PriceTracker):
+        '''Sets each logged product to its latest logged state (or, in older logs, its state after its latest event).'''
+        for record in self._records():
+            if "state" in record:
+                tracker.states[record["product_id"]] = ProductState(**record["state"])
+            else:
+                event = PriceEvent.from_dict(record)
+                tracker.states[event.product_id] = ProductState(event.new_price, event.new_merchant_id, event.kind != OUT_OF_STOCK)
+
+
+class Subscription:
+    '''Async iterator over the events of one subscriber.'''
+
+    def __init__(self, bus: 'EventBus', maxsize: int, kinds: Optional[Set[str]]):
+        self.bus = bus
+        self.kinds = kinds
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.closed = asyncio.Event()
+
+    def __aiter__(self) -> 'Subscription':
+        return self
+
+    async def __anext__(self) -> PriceEvent:
+        if self.closed.is_set() and self.queue.empty():
+            raise StopAsyncIteration
+        event = await self.queue.get()
+        if event is None:
+            raise StopAsyncIteration
+        return event
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+    async def put(self, event: PriceEvent):
+        '''Waits for room in the queue; gives up, dropping the event, once the subscription is closed.'''
+        if self.closed.is_set():
+            return
+        put = asyncio.ensure_future(self.queue.put(event))
+        closed = asyncio.ensure_future(self.closed.wait())
+        await asyncio.wait((put, closed), return_when=asyncio.FIRST_COMPLETED)
+        put.cancel()
+        closed.cancel()
+
+
+class EventBus:
+    '''
+    Fan-out to in-process async subscribers, each with its own bounded queue. publish()
+    waits while any interested subscriber's queue is full, so a slow consumer slows the
+    producer down instead of growing memory; a subscriber that closes stops holding it up.
+    Threads publish with publish_threadsafe, on the loop the bus was created in (or given).
+    '''
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        if loop is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                pass
+        self.loop = loop
+        self.subscriptions: List[Subscription] = []
+
+    def subscribe(self, maxsize: int = 1000, kinds: Optional[Iterable[str]] = None) -> Subscription:
+        self.loop = self.loop or asyncio.get_running_loop()
+        subscription = Subscription(self, maxsize, set(kinds) if kinds else None)
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        if subscription in self.subscriptions:
+            self.subscriptions.remove(subscription)
+        subscription.closed.set()
+
+    async def publish(self, events: Iterable[PriceEvent]):
+        self.loop = self.loop or asyncio.get_running_loop()
+        for event in events:
+            for subscription in list(self.subscriptions):
+                if subscription.kinds is None or event.kind in subscription.kinds:
+                    await subscription.put(event)
+
+    def publish_threadsafe(self, events: Iterable[PriceEvent], timeout: Optional[float] = None):
+        '''Blocks the calling thread until every subscriber has room for the events.'''
+        if self.loop is None:
+            raise RuntimeError("EventBus has no event loop; create it inside the loop or pass loop=")
+        asyncio.run_coroutine_threadsafe(self.publish(list(events)), self.loop).result(timeout)
+
+    async def close(self):
+        '''Ends every subscriber's iteration once it has read the events already in its queue.'''
+        for subscription in list(self.subscriptions):
+            self.unsubscribe(subscription)
+            if not subscription.queue.full():
+                # Wakes a subscriber waiting on an empty queue; a full one sees closed when it drains.
+                subscription.queue.put_nowait(None)
+
+
+class PriceFeed:
+    '''Diffs fetched responses against the last known state and publishes the changes.'''
+
+    def __init__(self, bus: Optional[EventBus] = None, log: Optional[EventLog] = None, tracker: Optional[PriceTracker] = None):
+        self.bus = bus or EventBus()
+        self.log = log
+        self.tracker = tracker or PriceTracker()
+        if log is not None:
+            self.tracker.track_changes = True
+            if tracker is None:
+                log.restore(self.tracker)
+
+    async def _emit(self, events: List[PriceEvent]) -> List[PriceEvent]:
+        if self.log is not None:
+            self.log.append(events, self.tracker.drain_changes())
+        await self.bus.publish(events)
+        return events
+
+    async def ingest_listing(self, data: Any) -> List[PriceEvent]:
+        return await self._emit(self.tracker.update_listing(data))
+
+    async def ingest_offers(self, product_id: str, data: Any) -> List[PriceEvent]:
+        return await self._emit(self.tracker.update_offers(product_id, data))
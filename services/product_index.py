@@ -0,0 +1,146 @@
+import glob
+import gzip
+import heapq
+import json
+import math
+import os
+import re
+from array import array
+from collections import Counter
+from typing import Optional, Dict, Any, List, Iterable, Tuple
+from models.product import Product
+
+_WORD = re.compile(r'\w+')
+
+DANISH_STOPWORDS = {
+    'af', 'alle', 'at', 'de', 'den', 'der', 'det', 'du', 'efter', 'eller', 'en', 'er', 'et', 'for',
+    'fra', 'har', 'i', 'ikke', 'med', 'men', 'og', 'om', 'op', 'på', 'som', 'til', 'ud', 'under', 'ved',
+}
+# Longest first, so 'erne' is stripped before 'er' and 'e'.
+DANISH_SUFFIXES = ('erendes', 'erende', 'hedens', 'ethed', 'heden', 'endes', 'erede', 'ernes', 'erens',
+                   'erets', 'ende', 'erne', 'eres', 'ered', 'heds', 'ens', 'ere', 'ers', 'ets', 'hed',
+                   'ene', 'en', 'er', 'es', 'et', 'e')
+
+# Term frequency weight per field.
+FIELD_WEIGHTS = {'name': 3, 'brand': 2, 'description': 1, 'keywords': 1}
+
+
+def stem(token: str) -> str:
+    '''Light Danish suffix stripping; keeps at least three characters of the stem.'''
+    for suffix in DANISH_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return [stem(token) for token in _WORD.findall(text.casefold()) if token not in DANISH_STOPWORDS]
+
+
+def _price(product: Dict[str, Any]) -> float:
+    try:
+        return float((product.get("lowestPrice") or {}).get("amount"))
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class ProductIndex:
+    '''
+    In-memory BM25 index over crawled listing products.
+    Postings are parallel array('I') doc ids / weighted term frequencies per term,
+    and per-document lengths, prices and subcategories are kept in flat arrays.
+    '''
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.products: List[Dict[str, Any]] = []
+        self._ids: Dict[str, int] = {}
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._lengths = array('I')
+        self._prices = array('d')
+        self._subcategories = array('I')
+        self._subcategory_ids: Dict[str, int] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def add_product(self, product: Dict[str, Any], subcategory_id: str, keywords: Optional[List[Dict[str, Any]]] = None):
+        '''keywords is the get_product_keywords payload for the product, if fetched.'''
+        if product.get("id") in self._ids:
+            return
+        doc = len(self.products)
+        self._ids[product.get("id")] = doc
+        self.products.append(product)
+
+        fields = {
+            'name': product.get("name"),
+            'brand': (product.get("brand") or {}).get("name"),
+            'description': product.get("description"),
+            'keywords': ' '.join(keyword.get("name", '') for keyword in keywords or []),
+        }
+        frequencies: Counter = Counter()
+        for field_name, text in fields.items():
+            for token in tokenize(text):
+                frequencies[token] += FIELD_WEIGHTS[field_name]
+        for term, frequency in frequencies.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array('I'), array('I'))
+            postings[0].append(doc)
+            postings[1].append(frequency)
+
+        length = sum(frequencies.values())
+        self._lengths.append(length)
+        self._total_length += length
+        self._prices.append(_price(product))
+        self._subcategories.append(self._subcategory_ids.setdefault(subcategory_id, len(self._subcategory_ids)))
+
+    def add_products(self, products: Iterable[Dict[str, Any]], subcategory_id: str, keywords: Optional[Dict[str, List[Dict[str, Any]]]] = None):
+        for product in products:
+            self.add_product(product, subcategory_id, (keywords or {}).get(product.get("id")))
+
+    @classmethod
+    def from_export(cls, export_dir: str) -> 'ProductIndex':
+        '''Builds an index from the subcategory=<id>/products.jsonl.gz files written by services.catalog_export.'''
+        index = cls()
+        for path in sorted(glob.glob(os.path.join(export_dir, 'subcategory=*', 'products.jsonl.gz'))):
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    record = json.loads(line)
+                    index.add_product(record, record.pop("subcategoryId"))
+        return index
+
+    def search(self, query: str, size: int = 10, subcategory_id: Optional[str] = None, min_price: Optional[float] = None, max_price: Optional[float] = None) -> List[Tuple[float, Dict[str, Any]]]:
+        '''(score, product) pairs, best first.'''
+        if not self.products:
+            return []
+        if subcategory_id is not None and subcategory_id not in self._subcategory_ids:
+            return []
+        subcategory = self._subcategory_ids.get(subcategory_id)
+        total = len(self.products)
+        average_length = self._total_length / total or 1
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            docs, frequencies = postings
+            idf = math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc, frequency in zip(docs, frequencies):
+                if subcategory is not None and self._subcategories[doc] != subcategory:
+                    continue
+                price = self._prices[doc]
+                if (min_price is not None and not price >= min_price) or (max_price is not None and not price <= max_price):
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[doc] / average_length)
+                scores[doc] = scores.get(doc, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        best = heapq.nlargest(size, scores.items(), key=lambda item: item[1])
+        return [(score, self.products[doc]) for doc, score in best]
+
+    def search_products(self, search_query: str, size: int = 10, subcategory_id: Optional[str] = None, min_price: Optional[float] = None, max_price: Optional[float] = None) -> List[Product]:
+        '''Offline counterpart of Searcher.search_products.'''
+        return [Product.from_dict(product) for _, product in self.search(search_query, size, subcategory_id, min_price, max_price)]
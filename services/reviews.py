@@ -0,0 +1,145 @@
+import gzip
+import json
+import sys
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Iterable, Iterator, Tuple
+from api_client.base_layer import get_product_reviews
+from services.model_layer import Review
+
+# Fields that repeat per review site; stored once per distinct combination.
+SOURCE_FIELDS = ('source', 'domain', 'logo', 'logoWidth', 'logoHeight', 'icon', 'iconWidth', 'iconHeight')
+INTERNED_FIELDS = ('lang', 'country', 'type', 'scoreMax')
+NUMERIC_FIELDS = ('score', 'votesUp', 'votesDown')
+TEXT_FIELDS = ('id', 'date', 'title', 'extract', 'author', 'product', 'feedbackUrl', 'link', 'pros', 'cons')
+
+
+class _Interner:
+    '''Maps values to dense integer codes.'''
+
+    def __init__(self):
+        self.values: List[Any] = []
+        self.codes: Dict[Any, int] = {}
+
+    def code(self, value: Any) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class ReviewStore:
+    '''
+    Deduplicated reviews in columnar form. Source/site fields are interned as one tuple per
+    distinct site, low-cardinality fields as integer codes, counters as arrays; only the
+    free-text fields are kept per review (with repeated strings sys.intern'ed).
+    '''
+
+    def __init__(self):
+        self.rows: Dict[str, int] = {}
+        self.product_rows: Dict[str, array] = {}
+        self._sources = _Interner()
+        self._interned = {name: _Interner() for name in INTERNED_FIELDS}
+        self._source_codes = array('I')
+        self._codes = {name: array('I') for name in INTERNED_FIELDS}
+        self._numbers = {name: array('d') for name in NUMERIC_FIELDS}
+        self._text: Dict[str, List[Optional[str]]] = {name: [] for name in TEXT_FIELDS}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, review_id: str) -> bool:
+        return review_id in self.rows
+
+    def add(self, review: Dict[str, Any], product_id: Optional[str] = None) -> bool:
+        '''Returns False if the review id was already stored (it is still linked to product_id).'''
+        review_id = str(review.get("id"))
+        row = self.rows.get(review_id)
+        is_new = row is None
+        if is_new:
+            row = self.rows[review_id] = len(self._source_codes)
+            self._source_codes.append(self._sources.code(tuple(review.get(name) for name in SOURCE_FIELDS)))
+            for name in INTERNED_FIELDS:
+                self._codes[name].append(self._interned[name].code(review.get(name)))
+            for name in NUMERIC_FIELDS:
+                value = review.get(name)
+                self._numbers[name].append(float(value) if value is not None else float('nan'))
+            for name in TEXT_FIELDS:
+                value = review.get(name)
+                self._text[name].append(sys.intern(value) if isinstance(value, str) and len(value) < 64 else value)
+            self._text['id'][row] = review_id
+        if product_id is not None:
+            rows = self.product_rows.setdefault(product_id, array('I'))
+            if row not in rows:
+                rows.append(row)
+        return is_new
+
+    def record(self, row: int) -> Dict[str, Any]:
+        data = dict(zip(SOURCE_FIELDS, self._sources.values[self._source_codes[row]]))
+        for name in INTERNED_FIELDS:
+            data[name] = self._interned[name].values[self._codes[name][row]]
+        for name in NUMERIC_FIELDS:
+            value = self._numbers[name][row]
+            data[name] = None if value != value else (int(value) if value.is_integer() else value)
+        for name in TEXT_FIELDS:
+            data[name] = self._text[name][row]
+        return data
+
+    def review(self, review_id: str) -> Review:
+        return Review.from_dict(self.record(self.rows[review_id]))
+
+    def reviews_for(self, product_id: str) -> List[Review]:
+        return [Review.from_dict(self.record(row)) for row in self.product_rows.get(product_id, [])]
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        for row in range(len(self._source_codes)):
+            yield self.record(row)
+
+    def save(self, path: str):
+        '''gzip JSONL: one line per review with its linked product ids.'''
+        products_by_row: Dict[int, List[str]] = {}
+        for product_id, rows in self.product_rows.items():
+            for row in rows:
+                products_by_row.setdefault(row, []).append(product_id)
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            for row, record in enumerate(self.records()):
+                f.write(json.dumps({"review": record, "products": products_by_row.get(row, [])}, ensure_ascii=False) + "\n")
+
+    @classmethod
+    def load(cls, path: str) -> 'ReviewStore':
+        store = cls()
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                data = json.loads(line)
+                store.add(data["review"])
+                for product_id in data["products"]:
+                    store.add(data["review"], product_id)
+        return store
+
+
+def _review_list(data: Any) -> List[Dict[str, Any]]:
+    if isinstance(data, dict):
+        return data.get("reviews", [])
+    return data or []
+
+
+class ReviewHarvester:
+    '''Fetches reviews for many products concurrently into a shared ReviewStore.'''
+
+    def __init__(self, store: Optional[ReviewStore] = None, count: int = 100, max_workers: int = 8):
+        self.store = store or ReviewStore()
+        self.count = count
+        self.max_workers = max_workers
+
+    def _fetch(self, product_id: str) -> Tuple[str, List[Dict[str, Any]]]:
+        return product_id, _review_list(get_product_reviews(product_id, self.count))
+
+    def harvest(self, product_ids: Iterable[str]) -> int:
+        '''Returns the number of reviews not seen before, in this or an earlier (loaded) run.'''
+        new_reviews = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for product_id, reviews in executor.map(self._fetch, dict.fromkeys(product_ids)):
+                for review in reviews:
+                    new_reviews += self.store.add(review, product_id)
+        return new_reviews
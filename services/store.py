@@ -0,0 +1,330 @@
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, is_dataclass
+from itertools import islice
+from typing import Optional, Dict, Any, List, Iterable, Iterator, Union
+from models.product import Product
+from services.model_layer import Review, Keyword
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS products (
+    id TEXT PRIMARY KEY,
+    subcategory_id TEXT,
+    name TEXT,
+    brand_id TEXT,
+    merchant_id TEXT,
+    price REAL,
+    currency TEXT,
+    rating REAL,
+    rank INTEGER,
+    url TEXT,
+    data TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS products_subcategory ON products (subcategory_id, price);
+CREATE INDEX IF NOT EXISTS products_merchant ON products (merchant_id);
+CREATE INDEX IF NOT EXISTS products_brand ON products (brand_id);
+
+CREATE TABLE IF NOT EXISTS offers (
+    product_id TEXT NOT NULL,
+    offer_id TEXT NOT NULL,
+    merchant_id TEXT,
+    price REAL,
+    currency TEXT,
+    url TEXT,
+    data TEXT,
+    updated_at REAL,
+    PRIMARY KEY (product_id, offer_id)
+);
+CREATE INDEX IF NOT EXISTS offers_merchant ON offers (merchant_id, price);
+
+CREATE TABLE IF NOT EXISTS price_history (
+    product_id TEXT NOT NULL,
+    merchant_id TEXT NOT NULL DEFAULT '',
+    ts TEXT NOT NULL,
+    price REAL,
+    PRIMARY KEY (product_id, merchant_id, ts)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS price_history_ts ON price_history (ts);
+
+CREATE TABLE IF NOT EXISTS categories (
+    id TEXT PRIMARY KEY,
+    parent_id TEXT,
+    name TEXT,
+    path TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS categories_parent ON categories (parent_id);
+
+CREATE TABLE IF NOT EXISTS keywords (
+    category_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    url TEXT,
+    PRIMARY KEY (category_id, name)
+);
+
+CREATE TABLE IF NOT EXISTS reviews (
+    id TEXT PRIMARY KEY,
+    date TEXT,
+    source TEXT,
+    score REAL,
+    title TEXT,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS reviews_date ON reviews (date);
+
+CREATE TABLE IF NOT EXISTS review_products (
+    review_id TEXT NOT NULL,
+    product_id TEXT NOT NULL,
+    PRIMARY KEY (product_id, review_id)
+) WITHOUT ROWID;
+'''
+
+UPSERT_PRODUCT = '''
+INSERT INTO products (id, subcategory_id, name, brand_id, merchant_id, price, currency, rating, rank, url, data, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    subcategory_id = COALESCE(excluded.subcategory_id, subcategory_id), name = excluded.name, brand_id = excluded.brand_id,
+    merchant_id = excluded.merchant_id, price = excluded.price, currency = excluded.currency, rating = excluded.rating,
+    rank = excluded.rank, url = excluded.url, data = excluded.data, updated_at = excluded.updated_at
+'''
+UPSERT_OFFER = '''
+INSERT INTO offers (product_id, offer_id, merchant_id, price, currency, url, data, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (product_id, offer_id) DO UPDATE SET
+    merchant_id = excluded.merchant_id, price = excluded.price, currency = excluded.currency, url = excluded.url,
+    data = excluded.data, updated_at = excluded.updated_at
+'''
+UPSERT_PRICE_POINT = '''
+INSERT INTO price_history (product_id, merchant_id, ts, price) VALUES (?, ?, ?, ?)
+ON CONFLICT (product_id, merchant_id, ts) DO UPDATE SET price = excluded.price
+'''
+UPSERT_CATEGORY = '''
+INSERT INTO categories (id, parent_id, name, path, updated_at) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    parent_id = COALESCE(excluded.parent_id, parent_id), name = COALESCE(excluded.name, name),
+    path = COALESCE(excluded.path, path), updated_at = excluded.updated_at
+'''
+UPSERT_KEYWORD = '''
+INSERT INTO keywords (category_id, name, url) VALUES (?, ?, ?)
+ON CONFLICT (category_id, name) DO UPDATE SET url = excluded.url
+'''
+UPSERT_REVIEW = '''
+INSERT INTO reviews (id, date, source, score, title, data) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET date = excluded.date, source = excluded.source, score = excluded.score, title = excluded.title, data = excluded.data
+'''
+LINK_REVIEW = 'INSERT OR IGNORE INTO review_products (review_id, product_id) VALUES (?, ?)'
+
+
+def _as_dict(item: Any) -> Dict[str, Any]:
+    if is_dataclass(item):
+        return asdict(item)
+    if hasattr(item, 'to_dict'):
+        return item.to_dict()
+    return item
+
+
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, dict):
+        value = value.get("amount", value.get("average"))
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _nested(data: Dict[str, Any], *keys: str) -> Any:
+    for key in keys:
+        data = data.get(key) if isinstance(data, dict) else None
+    return data
+
+
+def _batches(rows: Iterable[tuple], size: int) -> Iterator[List[tuple]]:
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _history_points(data: Any) -> Iterator[tuple]:
+    '''(timestamp, price) pairs from a pricehistory response, whichever list key it uses.'''
+    if isinstance(data, dict):
+        for key in ('history', 'priceHistory', 'points', 'data', 'prices'):
+            if isinstance(data.get(key), list):
+                data = data[key]
+                break
+    for point in data if isinstance(data, list) else []:
+        if not isinstance(point, dict):
+            continue
+        timestamp = point.get("date", point.get("time", point.get("timestamp")))
+        price = _number(point.get("lowestPrice", point.get("price", point.get("amount"))))
+        if timestamp is not None:
+            yield str(timestamp), price
+
+
+class SQLiteStore:
+    '''
+    Products, offers, price history, categories, keywords and reviews in one SQLite file
+    in WAL mode. Writes go through one connection, serialized by a lock, as executemany
+    upserts in one transaction per batch_size rows. Lookups use a read connection per
+    thread, so under WAL they neither wait for the writer nor block it. They are fixed SQL
+    strings that sqlite3 keeps prepared in each connection's statement cache.
+    '''
+
+    def __init__(self, path: str = 'pricerunner.db', batch_size: int = 10000):
+        self.path = path
+        self.batch_size = batch_size
+        self.conn = sqlite3.connect(path, check_same_thread=False, cached_statements=256)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('PRAGMA temp_store=MEMORY')
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+
+    def _reader(self) -> Optional[sqlite3.Connection]:
+        '''This thread's read connection; None for an in-memory database, which cannot be shared.'''
+        if self.path == ':memory:':
+            return None
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=256)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+            with self._lock:
+                self._readers.append(conn)
+        return conn
+
+    def close(self):
+        with self._lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers = []
+        self.conn.close()
+
+    def __enter__(self) -> 'SQLiteStore':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _write(self, sql: str, rows: Iterable[tuple]) -> int:
+        written = 0
+        for batch in _batches(rows, self.batch_size):
+            with self._lock, self.conn:
+                self.conn.executemany(sql, batch)
+            written += len(batch)
+        return written
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        conn = self._reader()
+        if conn is None:
+            with self._lock:
+                return [dict(row) for row in self.conn.execute(sql, params)]
+        return [dict(row) for row in conn.execute(sql, params)]
+
+    # --- Writes ---
+    def upsert_products(self, products: Iterable[Union[Product, Dict[str, Any]]], subcategory_id: Optional[str] = None) -> int:
+        '''Listing products (search/category/v3 dicts or models.product.Product).'''
+        now = time.time()
+
+        def rows():
+            for product in products:
+                data = _as_dict(product)
+                yield (
+                    str(data["id"]), subcategory_id, data.get("name"), _nested(data, "brand", "id"),
+                    _nested(data, "cheapestOffer", "merchant", "id"), _number(data.get("lowestPrice")),
+                    _nested(data, "lowestPrice", "currency"), _number(_nested(data, "rating", "average")),
+                    _nested(data, "rank", "rank"), data.get("url"), json.dumps(data, ensure_ascii=False), now,
+                )
+        return self._write(UPSERT_PRODUCT, rows())
+
+    def upsert_offers(self, product_id: str, offers: Any) -> int:
+        '''Offers from get_product_offers (the response or its offer list).'''
+        now = time.time()
+        if isinstance(offers, dict):
+            offers = offers.get("offers", [])
+
+        def rows():
+            for offer in offers or []:
+                merchant_id = offer.get("merchantId", _nested(offer, "merchant", "id"))
+                yield (
+                    str(product_id), str(offer.get("id")), None if merchant_id is None else str(merchant_id),
+                    _number(offer.get("price")), _nested(offer, "price", "currency"), offer.get("url"),
+                    json.dumps(offer, ensure_ascii=False), now,
+                )
+        return self._write(UPSERT_OFFER, rows())
+
+    def upsert_price_history(self, product_id: str, history: Any, merchant_id: str = '') -> int:
+        '''Points from get_price_history; merchant_id '' is the all-merchant series.'''
+        return self._write(UPSERT_PRICE_POINT, ((str(product_id), merchant_id, ts, price) for ts, price in _history_points(history)))
+
+    def upsert_categories(self, categories: Iterable[Any]) -> int:
+        '''Dicts or objects with id/parent_id/name/path, e.g. category_tree.TreeNode.'''
+        now = time.time()
+        rows = ((data["id"], data.get("parent_id"), data.get("name"), data.get("path"), now) for data in map(_as_dict, categories))
+        return self._write(UPSERT_CATEGORY, rows)
+
+    def upsert_keywords(self, category_id: str, keywords: Iterable[Union[Keyword, Dict[str, Any]]]) -> int:
+        return self._write(UPSERT_KEYWORD, ((category_id, data.get("name"), data.get("url")) for data in map(_as_dict, keywords)))
+
+    def upsert_reviews(self, reviews: Iterable[Union[Review, Dict[str, Any]]], product_id: Optional[str] = None) -> int:
+        reviews = [_as_dict(review) for review in reviews]
+        rows = ((str(data["id"]), data.get("date"), data.get("source"), _number(data.get("score")), data.get("title"), json.dumps(data, ensure_ascii=False)) for data in reviews)
+        written = self._write(UPSERT_REVIEW, rows)
+        if product_id is not None:
+            self._write(LINK_REVIEW, ((str(data["id"]), str(product_id)) for data in reviews))
+        return written
+
+    # --- Lookups ---
+    def product(self, product_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._query('SELECT data FROM products WHERE id = ?', (str(product_id),))
+        return json.loads(rows[0]["data"]) if rows else None
+
+    def products_in_subcategory(self, subcategory_id: str, max_price: Optional[float] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        '''Cheapest first.'''
+        rows = self._query(
+            'SELECT data FROM products WHERE subcategory_id = ? AND (? IS NULL OR price <= ?) ORDER BY price LIMIT ?',
+            (subcategory_id, max_price, max_price, limit),
+        )
+        return [json.loads(row["data"]) for row in rows]
+
+    def products_by_merchant(self, merchant_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        '''Products whose cheapest offer is from the merchant.'''
+        rows = self._query('SELECT data FROM products WHERE merchant_id = ? ORDER BY price LIMIT ?', (str(merchant_id), limit))
+        return [json.loads(row["data"]) for row in rows]
+
+    def products_by_brand(self, brand_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        rows = self._query('SELECT data FROM products WHERE brand_id = ? ORDER BY price LIMIT ?', (str(brand_id), limit))
+        return [json.loads(row["data"]) for row in rows]
+
+    def offers_for(self, product_id: str) -> List[Dict[str, Any]]:
+        return self._query('SELECT offer_id, merchant_id, price, currency, url, updated_at FROM offers WHERE product_id = ? ORDER BY price', (str(product_id),))
+
+    def price_history(self, product_id: str, since: Optional[str] = None, merchant_id: str = '') -> List[Dict[str, Any]]:
+        return self._query(
+            'SELECT ts, price FROM price_history WHERE product_id = ? AND merchant_id = ? AND ts >= ? ORDER BY ts',
+            (str(product_id), merchant_id, since or ''),
+        )
+
+    def children(self, category_id: str) -> List[Dict[str, Any]]:
+        return self._query('SELECT id, name, path FROM categories WHERE parent_id = ? ORDER BY id', (category_id,))
+
+    def keywords(self, category_id: str) -> List[Keyword]:
+        return [Keyword(**row) for row in self._query('SELECT name, url FROM keywords WHERE category_id = ? ORDER BY name', (category_id,))]
+
+    def reviews_for(self, product_id: str) -> List[Review]:
+        rows = self._query(
+            'SELECT r.data FROM review_products rp JOIN reviews r ON r.id = rp.review_id WHERE rp.product_id = ? ORDER BY r.date DESC',
+            (str(product_id),),
+        )
+        return [Review.from_dict(json.loads(row["data"])) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        tables = ('products', 'offers', 'price_history', 'categories', 'keywords', 'reviews')
+        return {table: self._query(f'SELECT COUNT(*) AS n FROM {table}')[0]["n"] for table in tables}
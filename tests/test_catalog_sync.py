@@ -0,0 +1,55 @@
+import json
+import os
+import tempfile
+import unittest
+from transport import http_client
+from services.catalog_sync import CatalogSync
+
+
+class _Response:
+    def __init__(self, url: str, status_code: int, body: bytes = b''):
+        self.url = url
+        self.status_code = status_code
+        self.content = body
+
+    def raise_for_status(self):
+        if self.status_code != 200:
+            import requests
+            raise requests.HTTPError(f"{self.status_code} for {self.url}", response=self)
+
+
+class _Upstream:
+    '''t1 lists t2 (whose hierarchy request fails) and cl40; cl40 has three products.'''
+
+    def send(self, url: str, get):
+        if url.endswith('/hierarchy/t1'):
+            return _Response(url, 200, json.dumps({"categories": [{"id": "t2"}, {"id": "cl40"}]}).encode())
+        if url.endswith('/hierarchy/t2'):
+            return _Response(url, 503)
+        if '/search/category/v3/DK/40' in url:
+            products = [{"id": str(i), "lowestPrice": {"amount": str(100 + i)}} for i in range(3)]
+            return _Response(url, 200, json.dumps({"totalProductHits": 3, "products": products}).encode())
+        return _Response(url, 404)
+
+
+class CatalogSyncTreeTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        http_client.set_policy(_Upstream())
+
+    def tearDown(self):
+        http_client.set_policy(None)
+        self.directory.cleanup()
+
+    def test_failed_hierarchy_request_is_skipped(self):
+        pages = []
+        sync = CatalogSync(os.path.join(self.directory.name, 'state.json'), on_page=lambda sub, offset, products: pages.append(sub))
+        stats = sync.sync_tree(['t1'])
+        self.assertEqual(stats.failed_categories, 1)
+        self.assertEqual(stats.subcategories, 1)
+        self.assertEqual(stats.recrawled, 1)
+        self.assertEqual(pages, ['cl40'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,225 @@
+import bisect
+import hashlib
+import heapq
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Optional, Dict, List, Iterator, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CODEC_ZLIB = 0
+CODEC_ZSTD = 1
+
+# Index entry: url key (blake2b-128), fetch time, segment number, offset, record length, codec.
+INDEX_ENTRY = struct.Struct('<16sdIQIB3x')
+# Segment record header: url length, compressed body length, codec. Followed by url bytes and body.
+RECORD_HEADER = struct.Struct('<HIB')
+
+
+def canonical_url(url: str) -> str:
+    '''Lower-cased scheme and host, query parameters sorted, empty parameters dropped.'''
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=False)), safe=',')
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, query, ''))
+
+
+def url_key(url: str) -> bytes:
+    return hashlib.blake2b(canonical_url(url).encode('utf-8'), digest_size=16).digest()
+
+
+class ResponseArchive:
+    '''
+    Append-only archive of raw upstream responses.
+
+    Bodies are compressed (zstd when the zstandard package is installed, zlib otherwise)
+    and appended to numbered segment files. Every record gets a fixed-size entry in
+    index.log; compact() merges the log into index.sorted, which is memory-mapped and
+    binary-searched, so a lookup touches O(log n) index entries and one segment read.
+    Entries not yet compacted are also held in memory, so the log is compacted
+    automatically once it holds compact_threshold entries, on open, and on close().
+
+    Use as a write-through sink: transport.http_client.add_sink(archive.append)
+    '''
+
+    def __init__(self, directory: str, segment_size: int = 256 * 1024 * 1024, level: int = 3, compact_threshold: int = 100_000):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.compact_threshold = compact_threshold
+        os.makedirs(directory, exist_ok=True)
+        self.codec = CODEC_ZSTD if zstandard else CODEC_ZLIB
+        self._compress = zstandard.ZstdCompressor(level=level).compress if zstandard else (lambda body: zlib.compress(body, level))
+        self._lock = threading.Lock()
+        self._readers: Dict[int, int] = {}
+        self._sorted_file = None
+        self._sorted: Optional[mmap.mmap] = None
+        self._open_sorted()
+        self._recent: Dict[bytes, List[Tuple[float, int, int, int, int]]] = {}
+        self._recent_count = 0
+        self._log = open(self._path('index.log'), 'ab+')
+        self._log.seek(0)
+        for entry in INDEX_ENTRY.iter_unpack(self._log.read()):
+            self._remember(entry)
+        if self._recent_count:
+            with self._lock:
+                self._compact()
+        self._segment_number = max(self._segment_numbers(), default=0)
+        self._segment = open(self._segment_path(self._segment_number), 'ab')
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _segment_path(self, number: int) -> str:
+        return self._path(f"segment-{number:05d}.dat")
+
+    def _segment_numbers(self) -> List[int]:
+        return sorted(int(name[8:13]) for name in os.listdir(self.directory) if name.startswith('segment-') and name.endswith('.dat'))
+
+    def _open_sorted(self):
+        if self._sorted is not None:
+            self._sorted.close()
+            self._sorted_file.close()
+            self._sorted, self._sorted_file = None, None
+        path = self._path('index.sorted')
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self._sorted_file = open(path, 'rb')
+            self._sorted = mmap.mmap(self._sorted_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _remember(self, entry: tuple):
+        key, fetched_at, segment, offset, length, codec = entry
+        versions = self._recent.setdefault(key, [])
+        bisect.insort(versions, (fetched_at, segment, offset, length, codec))
+        self._recent_count += 1
+
+    def __len__(self) -> int:
+        sorted_count = len(self._sorted) // INDEX_ENTRY.size if self._sorted is not None else 0
+        return sorted_count + sum(len(versions) for versions in self._recent.values())
+
+    # --- writing ---
+    def append(self, url: str, body: bytes, fetched_at: Optional[float] = None):
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        url_bytes = canonical_url(url).encode('utf-8')
+        compressed = self._compress(body)
+        record = RECORD_HEADER.pack(len(url_bytes), len(compressed), self.codec) + url_bytes + compressed
+        with self._lock:
+            if self._segment.tell() and self._segment.tell() + len(record) > self.segment_size:
+                self._segment.close()
+                self._segment_number += 1
+                self._segment = open(self._segment_path(self._segment_number), 'ab')
+            offset = self._segment.tell()
+            self._segment.write(record)
+            self._segment.flush()
+            entry = (url_key(url), fetched_at, self._segment_number, offset, len(record), self.codec)
+            self._log.write(INDEX_ENTRY.pack(*entry))
+            self._log.flush()
+            self._remember(entry)
+            if self._recent_count >= self.compact_threshold:
+                self._compact()
+
+    def _compact(self):
+        recent = sorted((key,) + version for key, versions in self._recent.items() for version in versions)
+        existing = INDEX_ENTRY.iter_unpack(self._sorted) if self._sorted is not None else ()
+        tmp_path = self._path('index.sorted.tmp')
+        with open(tmp_path, 'wb') as f:
+            for entry in heapq.merge(existing, recent, key=lambda entry: (entry[0], entry[1])):
+                f.write(INDEX_ENTRY.pack(*entry))
+        os.replace(tmp_path, self._path('index.sorted'))
+        self._open_sorted()
+        self._log.truncate(0)
+        self._recent = {}
+        self._recent_count = 0
+
+    def compact(self):
+        '''Merges index.log into the memory-mapped index.sorted and empties the log.'''
+        with self._lock:
+            self._compact()
+
+    def close(self):
+        with self._lock:
+            if self._recent_count:
+                self._compact()
+            self._segment.close()
+            self._log.close()
+            for fd in self._readers.values():
+                os.close(fd)
+            self._readers = {}
+            if self._sorted is not None:
+                self._sorted.close()
+                self._sorted_file.close()
+
+    # --- reading ---
+    def _sorted_versions(self, key: bytes) -> List[Tuple[float, int, int, int, int]]:
+        if self._sorted is None:
+            return []
+        size = INDEX_ENTRY.size
+        low, high = 0, len(self._sorted) // size
+        while low < high:
+            mid = (low + high) // 2
+            if self._sorted[mid * size:mid * size + 16] < key:
+                low = mid + 1
+            else:
+                high = mid
+        versions = []
+        while low * size < len(self._sorted) and self._sorted[low * size:low * size + 16] == key:
+            versions.append(INDEX_ENTRY.unpack_from(self._sorted, low * size)[1:])
+            low += 1
+        return versions
+
+    def versions(self, url: str) -> List[float]:
+        '''Fetch times of every archived response for url, oldest first.'''
+        key = url_key(url)
+        with self._lock:
+            return sorted(version[0] for version in self._sorted_versions(key) + self._recent.get(key, []))
+
+    def _read(self, segment: int, offset: int, length: int) -> Tuple[str, bytes]:
+        with self._lock:
+            fd = self._readers.get(segment)
+            if fd is None:
+                fd = self._readers[segment] = os.open(self._segment_path(segment), os.O_RDONLY)
+        record = os.pread(fd, length, offset)
+        url_length, body_length, codec = RECORD_HEADER.unpack_from(record)
+        start = RECORD_HEADER.size + url_length
+        return record[RECORD_HEADER.size:start].decode('utf-8'), _decompress(record[start:start + body_length], codec)
+
+    def lookup(self, url: str, at: Optional[float] = None) -> Optional[bytes]:
+        '''Body of the latest response for url fetched at or before at (default: latest overall).'''
+        key = url_key(url)
+        with self._lock:
+            versions = sorted(self._sorted_versions(key) + self._recent.get(key, []))
+        if at is not None:
+            versions = [version for version in versions if version[0] <= at]
+        if not versions:
+            return None
+        _, segment, offset, length, _ = versions[-1]
+        return self._read(segment, offset, length)[1]
+
+    def iter_records(self) -> Iterator[Tuple[str, bytes]]:
+        '''Sequentially reads every (canonical url, body) in append order, for reprocessing.'''
+        for number in self._segment_numbers():
+            with open(self._segment_path(number), 'rb') as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(f.name) else b''
+                position = 0
+                while position < len(data):
+                    url_length, body_length, codec = RECORD_HEADER.unpack_from(data, position)
+                    start = position + RECORD_HEADER.size
+                    url = data[start:start + url_length].decode('utf-8')
+                    body = data[start + url_length:start + url_length + body_length]
+                    yield url, _decompress(body, codec)
+                    position = start + url_length + body_length
+                if data:
+                    data.close()
+
+
+def _decompress(body: bytes, codec: int) -> bytes:
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(body)
+    if zstandard is None:
+        raise ImportError("Reading zstd archive records requires zstandard: pip install zstandard")
+    return zstandard.ZstdDecompressor().decompress(body)
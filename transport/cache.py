@@ -0,0 +1,73 @@
+import gzip
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from transport.archive import canonical_url
+
+
+class ResponseCache:
+    '''
+    In-memory LRU cache of raw response bodies keyed by canonical URL, with a TTL.
+    Bodies are stored as bytes and parsed per hit, so callers can never mutate a cached value.
+    '''
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[str, Tuple[float, bytes]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, url: str) -> bool:
+        return self.get(url, count=False) is not None
+
+    def get(self, url: str, count: bool = True) -> Optional[bytes]:
+        key = canonical_url(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += count
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += count
+            return None
+
+    def put(self, url: str, body: bytes, ttl: Optional[float] = None):
+        key = canonical_url(url)
+        with self._lock:
+            self._entries[key] = (time.time() + (self.ttl if ttl is None else ttl), body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def save(self, path: str):
+        '''Writes unexpired entries as gzip JSONL, e.g. after a warm-up run, for load() at service start.'''
+        now = time.time()
+        with self._lock:
+            entries = [(key, expires, body) for key, (expires, body) in self._entries.items() if expires > now]
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            for key, expires, body in entries:
+                f.write(json.dumps({"url": key, "expires": expires, "body": body.decode('utf-8')}, ensure_ascii=False) + "\n")
+
+    def load(self, path: str) -> int:
+        '''Adds the unexpired entries of a save() file; returns how many were loaded.'''
+        loaded, now = 0, time.time()
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry["expires"] > now:
+                    self.put(entry["url"], entry["body"].encode('utf-8'), ttl=entry["expires"] - now)
+                    loaded += 1
+        return loaded
@@ -0,0 +1,103 @@
+import time
+from typing import Optional, Callable, List, TYPE_CHECKING
+from transport.rate_limit import RateLimiter
+from transport.tracing import record_call
+
+# requests (and everything it pulls in) is only imported by the first upstream request.
+if TYPE_CHECKING:
+    import requests
+    from transport.cache import ResponseCache
+    from transport.policy import TransportPolicy
+
+Sink = Callable[[str, bytes], None]
+
+_policy: Optional['TransportPolicy'] = None
+_cache: Optional['ResponseCache'] = None
+_rate_limiter: Optional[RateLimiter] = None
+_sinks: List[Sink] = []
+
+
+def set_policy(policy: Optional['TransportPolicy']):
+    '''Routes every upstream request through policy (hedging, circuit breaking); None restores plain requests.get.'''
+    global _policy
+    _policy = policy
+
+
+def get_policy() -> Optional['TransportPolicy']:
+    return _policy
+
+
+def set_cache(cache: Optional['ResponseCache']):
+    '''Serves fetch() from cache when possible and stores every successful body in it; None disables caching.'''
+    global _cache
+    _cache = cache
+
+
+def get_cache() -> Optional['ResponseCache']:
+    return _cache
+
+
+def set_rate_limit(rate: Optional[float], burst: int = 1):
+    '''Global limit of rate upstream requests per second across all threads; None removes it.'''
+    global _rate_limiter
+    _rate_limiter = RateLimiter(rate, burst) if rate else None
+
+
+def add_sink(sink: Sink):
+    '''sink(url, body) is called with the raw body of every successful upstream response. Sink exceptions are printed, not raised.'''
+    _sinks.append(sink)
+
+
+def try_acquire_rate_limit() -> bool:
+    '''Takes one request from the global rate limit if it allows one right now; always True without a limit.'''
+    return _rate_limiter is None or _rate_limiter.try_acquire()
+
+
+def remove_sink(sink: Sink):
+    _sinks.remove(sink)
+
+
+def __getattr__(name: str):
+    # Lets callers write `except http_client.RequestException` without importing requests up front.
+    if name == 'RequestException':
+        import requests
+        return requests.RequestException
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get(url: str) -> 'requests.Response':
+    '''One upstream request, subject to the rate limit and policy. Never served from the cache.'''
+    import requests
+    if _rate_limiter is not None:
+        _rate_limiter.acquire()
+    started = time.perf_counter()
+    response = None
+    try:
+        if _policy is None:
+            response = requests.get(url)
+        else:
+            response = _policy.send(url, requests.get)
+    finally:
+        record_call(url, time.perf_counter() - started, response is not None and response.status_code == 200)
+    if _sinks and response.status_code == 200:
+        for sink in list(_sinks):
+            try:
+                sink(url, response.content)
+            except Exception as e:
+                # A failing sink (e.g. a full disk under an archive) must not fail the request.
+                print(f"Warning: Response sink {sink!r} failed for {url}. Exception: {e!r}")
+    return response
+
+
+def fetch(url: str) -> bytes:
+    '''Body of a successful response for url, from the cache if present. Raises requests.RequestException.'''
+    if _cache is not None:
+        body = _cache.get(url)
+        if body is not None:
+            return body
+    response = get(url)
+    response.raise_for_status()
+    body = response.content
+    if _cache is not None:
+        _cache.put(url, body)
+    return body
@@ -0,0 +1,203 @@
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Optional, Dict, Callable, Iterable, Deque
+import requests
+from transport import http_client
+
+
+class CircuitOpenError(requests.RequestException):
+    '''Raised instead of sending a request while an endpoint family's breaker is open.'''
+
+
+def endpoint_family(url: str) -> str:
+    '''
+    Path up to the first country code or id segment, e.g.
+    .../public/product-detail/v0/offers/DK/3205665051?... -> 'product-detail/v0/offers'
+    '''
+    path = url.split('?', 1)[0].rsplit('/public/', 1)[-1]
+    family = []
+    for segment in path.split('/'):
+        if not segment or segment == 'DK' or (re.search(r'\d', segment) and not re.fullmatch(r'v\d+', segment)):
+            break
+        family.append(segment)
+    return '/'.join(family)
+
+
+class LatencyTracker:
+    '''Sliding window of recent latencies for one endpoint family.'''
+
+    def __init__(self, window: int = 200):
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def add(self, latency: float):
+        self.samples.append(latency)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    '''
+    closed -> open after failure_threshold consecutive failures.
+    open -> half-open after reset_timeout; one probe request is let through.
+    half-open -> closed on success, back to open on failure.
+    '''
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half-open'
+                return True
+            return False
+
+    def record(self, ok: bool):
+        with self._lock:
+            if ok:
+                self.state, self.failures = 'closed', 0
+                return
+            self.failures += 1
+            if self.state == 'half-open' or self.failures >= self.failure_threshold:
+                self.state, self.opened_at = 'open', time.monotonic()
+
+
+def _is_failure(response: Optional[requests.Response]) -> bool:
+    return response is None or response.status_code >= 500 or response.status_code == 429
+
+
+class TransportPolicy:
+    '''
+    Opt-in request policy for transport.http_client (see set_policy).
+
+    Hedging: for families in hedge_families (all families when None), a duplicate request is
+    sent if the first has not answered after the family's recent hedge_percentile latency,
+    and whichever finishes first wins. At most max_hedge_ratio of requests are hedged, so a
+    degraded upstream does not see double load. A hedge also needs a free token from
+    http_client's global rate limit, so duplicates never push traffic past it. Requests of other families run inline on the
+    caller's thread; a hedgeable request runs on a thread of its own so the caller can take
+    whichever answer comes first, and only the duplicates share the max_workers pool.
+
+    Circuit breaking: every family has its own CircuitBreaker. Exceptions, 5xx and 429 count
+    as failures; while open, requests fail immediately with CircuitOpenError.
+    '''
+
+    def __init__(self,
+                 hedge_families: Optional[Iterable[str]] = ('product-detail/v0/offers', 'pricehistory/product'),
+                 hedge_percentile: float = 0.95,
+                 min_hedge_delay: float = 0.05,
+                 default_hedge_delay: float = 1.0,
+                 min_samples: int = 20,
+                 max_hedge_ratio: float = 0.1,
+                 failure_threshold: int = 5,
+                 reset_timeout: float = 30.0,
+                 max_workers: int = 16):
+        self.hedge_families = set(hedge_families) if hedge_families is not None else None
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay = min_hedge_delay
+        self.default_hedge_delay = default_hedge_delay
+        self.min_samples = min_samples
+        self.max_hedge_ratio = max_hedge_ratio
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.latencies: Dict[str, LatencyTracker] = {}
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.requests = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hedge')
+
+    def _family_state(self, family: str):
+        with self._lock:
+            if family not in self.breakers:
+                self.breakers[family] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                self.latencies[family] = LatencyTracker()
+            return self.breakers[family], self.latencies[family]
+
+    def hedge_delay(self, family: str) -> float:
+        tracker = self.latencies.get(family)
+        if tracker is None or len(tracker.samples) < self.min_samples:
+            return self.default_hedge_delay
+        return max(self.min_hedge_delay, tracker.percentile(self.hedge_percentile))
+
+    def _hedgeable(self, family: str) -> bool:
+        return self.hedge_families is None or family in self.hedge_families
+
+    def _should_hedge(self, family: str) -> bool:
+        if not self._hedgeable(family):
+            return False
+        with self._lock:
+            if self.hedges + 1 > self.max_hedge_ratio * self.requests:
+                return False
+            if not http_client.try_acquire_rate_limit():
+                return False
+            self.hedges += 1
+            return True
+
+    def _timed(self, get: Callable[[str], requests.Response], url: str, tracker: LatencyTracker) -> requests.Response:
+        started = time.perf_counter()
+        response = get(url)
+        tracker.add(time.perf_counter() - started)
+        return response
+
+    def _start(self, get: Callable[[str], requests.Response], url: str, tracker: LatencyTracker) -> Future:
+        '''Runs the request on a new thread, so it never queues behind other requests or hedges.'''
+        future: Future = Future()
+
+        def run():
+            future.set_running_or_notify_cancel()
+            try:
+                future.set_result(self._timed(get, url, tracker))
+            except BaseException as e:
+                future.set_exception(e)
+        threading.Thread(target=run, name='hedge-primary', daemon=True).start()
+        return future
+
+    def send(self, url: str, get: Callable[[str], requests.Response] = requests.get) -> requests.Response:
+        family = endpoint_family(url)
+        breaker, tracker = self._family_state(family)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit open for '{family}', not sending {url}")
+        with self._lock:
+            self.requests += 1
+
+        response = None
+        try:
+            if not self._hedgeable(family):
+                response = self._timed(get, url, tracker)
+                return response
+            primary = self._start(get, url, tracker)
+            done, _ = wait([primary], timeout=self.hedge_delay(family))
+            if done or not self._should_hedge(family):
+                response = primary.result()
+            else:
+                pending = {primary, self._executor.submit(self._timed, get, url, tracker)}
+                error = None
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        try:
+                            response = future.result()
+                            pending = set()
+                            break
+                        except requests.RequestException as e:
+                            error = e
+                if response is None:
+                    raise error
+            return response
+        finally:
+            breaker.record(not _is_failure(response))
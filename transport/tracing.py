@@ -0,0 +1,115 @@
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, List
+
+# Frames from these packages are kept when attributing an upstream call to its caller.
+TRACED_PACKAGES = ('services', 'api_client')
+# Plumbing between the endpoint functions and the transport; left out of stacks.
+UNTRACED_FUNCTIONS = {'fetch_json'}
+
+_active: List['Trace'] = []
+_active_lock = threading.Lock()
+
+
+@dataclass
+class TracedCall:
+    url: str
+    operation: str
+    stack: List[str]
+    elapsed: float
+    ok: bool
+
+    def __str__(self):
+        return f"TracedCall(operation={self.operation}, url={self.url}, elapsed={self.elapsed:.3f}s)"
+
+
+class Trace:
+    '''Collects every upstream call made while it is active. Use through `trace()`.'''
+
+    def __init__(self):
+        self.calls: List[TracedCall] = []
+        self._lock = threading.Lock()
+
+    def add(self, call: TracedCall):
+        with self._lock:
+            self.calls.append(call)
+
+    def duplicate_urls(self) -> Dict[str, int]:
+        '''URLs that were fetched more than once, with their fetch counts.'''
+        counts = Counter(call.url for call in self.calls)
+        return {url: count for url, count in counts.most_common() if count > 1}
+
+    def calls_per_operation(self) -> Dict[str, int]:
+        '''Number of upstream calls caused by each outermost model-layer method.'''
+        return dict(Counter(call.operation for call in self.calls).most_common())
+
+    def over_budget(self, budgets: Dict[str, int]) -> Dict[str, int]:
+        '''Operations whose call count exceeds their budget, e.g. {'Category.get_name': 1}.'''
+        per_operation = self.calls_per_operation()
+        return {op: count for op, count in per_operation.items() if op in budgets and count > budgets[op]}
+
+    def summary(self) -> str:
+        lines = [f"{len(self.calls)} upstream calls, {sum(c.elapsed for c in self.calls):.3f}s total"]
+        lines.append("Calls per operation:")
+        lines += [f"  {count:5d}  {op}" for op, count in self.calls_per_operation().items()]
+        duplicates = self.duplicate_urls()
+        if duplicates:
+            lines.append("Duplicate URLs:")
+            lines += [f"  {count:5d}  {url}" for url, count in duplicates.items()]
+        return "\n".join(lines)
+
+    def to_folded(self, by_time: bool = False) -> str:
+        '''
+        Collapsed stack format understood by flamegraph.pl, speedscope and inferno.
+        Weights are call counts, or milliseconds when by_time is set.
+        '''
+        weights: Counter = Counter()
+        for call in self.calls:
+            weights[';'.join(call.stack)] += round(call.elapsed * 1000) if by_time else 1
+        return "\n".join(f"{stack} {weight}" for stack, weight in weights.items())
+
+
+@contextmanager
+def trace() -> Iterator[Trace]:
+    '''
+    with trace() as t:
+        Category('t9').get_name()
+    print(t.summary())
+    '''
+    active_trace = Trace()
+    with _active_lock:
+        _active.append(active_trace)
+    try:
+        yield active_trace
+    finally:
+        with _active_lock:
+            _active.remove(active_trace)
+
+
+def _caller_stack(frame) -> List[str]:
+    stack = []
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if module.split('.', 1)[0] in TRACED_PACKAGES and frame.f_code.co_name not in UNTRACED_FUNCTIONS:
+            stack.append(getattr(frame.f_code, 'co_qualname', frame.f_code.co_name))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def record_call(url: str, elapsed: float, ok: bool):
+    '''Called by the transport for every upstream request; a no-op unless a trace is active.'''
+    if not _active:
+        return
+    # Skip this function and the transport function that called it.
+    stack = _caller_stack(sys._getframe(2)) or ['<direct>']
+    model_frames = [name for name in stack if '.' in name]
+    operation = model_frames[0] if model_frames else stack[0]
+    call = TracedCall(url=url, operation=operation, stack=stack, elapsed=elapsed, ok=ok)
+    with _active_lock:
+        traces = list(_active)
+    for active_trace in traces:
+        active_trace.add(call)
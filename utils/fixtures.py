@@ -0,0 +1,93 @@
+'''
+Synthetic upstream responses shared by utils/memory_budget.py and utils/load_test.py: listing
+products, paged listings and a category tree, plus a transport policy that serves them.
+'''
+import json
+import re
+import zlib
+from typing import Optional, Dict, Any, Callable
+
+FIXTURE_PRODUCTS = 5000
+FIXTURE_MERCHANTS = 300
+FIXTURE_BRANDS = 200
+FIXTURE_TREE_FANOUT = 8
+FIXTURE_TREE_DEPTH = 3
+
+
+def fixture_product(i: int) -> Dict[str, Any]:
+    '''Deterministic listing product with every field models.product.Product expects.'''
+    def merchant(m: int, clickable: Optional[bool] = None) -> Dict[str, Any]:
+        data = {"id": str(m), "name": f"Merchant {m}", "image": {"id": None, "url": None, "path": f"/images/merchants/{m}.png", "description": f"Merchant {m}"}}
+        if clickable is not None:
+            data["clickable"] = clickable
+        return data
+    price = str(99 + (i * 37) % 9000)
+    return {
+        "id": str(3200000000 + i), "name": f"Product {i} with a fairly typical long listing name", "description": "Description " * 8,
+        "url": f"/pl/40-{3200000000 + i}/Product-{i}", "lowestPrice": {"amount": price, "currency": "DKK"},
+        "image": {"id": None, "url": None, "path": f"/product/{i}.jpg", "description": f"Product {i}"},
+        "filterHits": [{"id": "60326873", "values": [str(i % 8)]}], "rank": {"rank": i + 1, "trend": "UP"},
+        "brand": {"id": str(i % FIXTURE_BRANDS), "name": f"Brand {i % FIXTURE_BRANDS}", "image": None},
+        "rating": {"numberOfRatings": i % 500, "averageRating": "4.3", "count": i % 500, "average": "4.3"},
+        "priceDrop": None, "ribbon": {"type": "POPULAR", "value": "Popular", "description": None}, "productGroup": None,
+        "cheapestOffer": {"id": f"o{i}", "price": {"amount": price, "currency": "DKK"}, "url": f"/gotostore/{i}", "merchant": merchant(i % FIXTURE_MERCHANTS), "pricePerUnit": None},
+        "classification": "PRODUCT", "previewMerchants": {"count": 3, "merchants": [merchant((i + k) % FIXTURE_MERCHANTS, True) for k in range(3)]},
+        "installmentPrice": None,
+    }
+
+
+def fixture_listing(url: str) -> Dict[str, Any]:
+    offset = int((re.search(r'offset=(\d+)', url) or [0, 0])[1])
+    size = int((re.search(r'size=(\d+)', url) or [0, 10])[1])
+    return {"totalProductHits": FIXTURE_PRODUCTS, "products": [fixture_product(i) for i in range(offset, min(offset + size, FIXTURE_PRODUCTS))]}
+
+
+def fixture_hierarchy(url: str) -> Dict[str, Any]:
+    node = url.rsplit('/', 1)[-1].split('?')[0]
+    depth = node.count('_')
+    if depth + 1 >= FIXTURE_TREE_DEPTH:
+        children = [{"id": f"cl{zlib.crc32(node.encode()) % 100000}{k}", "name": f"Sub {k}", "path": f"/cl/{k}"} for k in range(FIXTURE_TREE_FANOUT)]
+    else:
+        children = [{"id": f"{node}_{k}", "name": f"Category {k}", "path": f"/t/{k}"} for k in range(FIXTURE_TREE_FANOUT)]
+    return {"name": node, "path": f"/t/{node}", "categories": children}
+
+
+FIXTURE_ROUTES = [
+    (re.compile(r'/search/category/v3/DK/'), fixture_listing),
+    (re.compile(r'/navigation/menu/DK/hierarchy/'), fixture_hierarchy),
+]
+
+
+class _FixtureResponse:
+    def __init__(self, url: str, body: Optional[bytes]):
+        self.url = url
+        self.status_code = 200 if body is not None else 404
+        self.content = body or b''
+
+    def raise_for_status(self):
+        if self.status_code != 200:
+            import requests
+            raise requests.HTTPError(f"No fixture for {self.url}")
+
+
+class FixturePolicy:
+    '''
+    Transport policy that never goes upstream: responses come from a recorded ResponseArchive
+    when one is given and has the URL, otherwise from the synthetic FIXTURE_ROUTES.
+    '''
+
+    def __init__(self, archive_dir: Optional[str] = None):
+        import requests  # imported here so the first request does not count against the crawl
+        self.archive = None
+        if archive_dir:
+            from transport.archive import ResponseArchive
+            self.archive = ResponseArchive(archive_dir)
+
+    def send(self, url: str, get: Callable) -> _FixtureResponse:
+        body = self.archive.lookup(url) if self.archive is not None else None
+        if body is None:
+            for pattern, route in FIXTURE_ROUTES:
+                if pattern.search(url):
+                    body = json.dumps(route(url)).encode('utf-8')
+                    break
+        return _FixtureResponse(url, body)
@@ -0,0 +1,52 @@
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+# Cumulative import time budget per module in milliseconds, measured in a fresh interpreter.
+BUDGETS_MS = {
+    'api_client.base_layer': 40,
+    'transport.http_client': 30,
+    'models.product': 30,
+    'services.model_layer': 60,
+    'services.autocomplete': 60,
+}
+# Heavy third-party packages that must only be imported by the first request/use.
+FORBIDDEN_AT_IMPORT = ('requests', 'urllib3', 'flask', 'colorama', 'pyarrow', 'zstandard')
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_IMPORTTIME_LINE = re.compile(r'import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)')
+
+
+def measure(module: str) -> tuple:
+    '''Returns (cumulative import time in ms, heavy modules it loaded) for one cold import.'''
+    code = f"import sys, {module}; print(','.join(m for m in {FORBIDDEN_AT_IMPORT!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    cumulative_us = 0
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match and match.group(3) == module:
+            cumulative_us = int(match.group(1))
+    loaded = [name for name in result.stdout.strip().split(',') if name]
+    return cumulative_us / 1000, loaded
+
+
+def check(runs: int = 5) -> bool:
+    '''Prints a report and returns False if any module is over budget or imports a heavy dependency.'''
+    ok = True
+    for module, budget in BUDGETS_MS.items():
+        samples = [measure(module) for _ in range(runs)]
+        median_ms = statistics.median(ms for ms, _ in samples)
+        loaded = samples[0][1]
+        status = 'ok'
+        if median_ms > budget:
+            status, ok = 'OVER BUDGET', False
+        if loaded:
+            status, ok = f"imports {', '.join(loaded)}", False
+        print(f"{module:28s} {median_ms:7.1f} ms  (budget {budget} ms)  {status}")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if check() else 1)
@@ -0,0 +1,310 @@
+'''
+Open-loop load generator for the category API server (old/api_server.py or a successor).
+
+Requests are sent on a fixed (or Poisson) schedule regardless of how fast the server answers,
+and latency is measured from the scheduled send time, so a saturated server shows up as
+growing latency and falling throughput instead of a slower request rate.
+
+Examples:
+python utils/load_test.py --serve-old --rates 5,10,20,40 --duration 10
+python utils/load_test.py --target http://localhost:5000 --rates 50 --duration 30 --poisson
+'''
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, Any, List, Tuple
+from urllib.parse import urlparse, parse_qs, urlencode
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from utils.fixtures import fixture_product
+
+OLD_DIR = os.path.join(REPO_ROOT, 'old')
+BRANDS = ['Noctua', 'AMD', 'Intel', 'ASUS', 'MSI', 'Corsair', 'be quiet!', 'Gigabyte', 'Kingston', 'Samsung']
+SORTINGS = ['RANK_desc', 'PRICE_asc', 'PRICE_desc', 'RANK_asc']
+SIZES = [10, 12, 24, 48]
+RANGE_FILTERS = {'PRICE', 'RATING', 'PRICE_DROP'}
+
+
+# --- Upstream stub ---
+def _facet(filter_id: str) -> Dict[str, Any]:
+    if filter_id in RANGE_FILTERS:
+        return {"facet": {"id": filter_id, "type": "RANGE", "minimum": 0, "maximum": 20000}}
+    names = BRANDS if filter_id == 'BRAND' else [f"Option {k}" for k in range(12)]
+    counts = [{"key": name, "optionId": str(500 + k), "optionValue": name, "count": 100 - k} for k, name in enumerate(names)]
+    return {"facet": {"id": filter_id, "type": "OPTIONS", "counts": counts}}
+
+
+def _listing(category_id: str, query: Dict[str, List[str]]) -> Dict[str, Any]:
+    size = int(query.get("size", ["10"])[0] or 10)
+    offset = int(query.get("offset", ["0"])[0] or 0)
+    seed = int(category_id) if category_id.isdigit() else 0
+    return {"totalProductHits": 1000, "products": [fixture_product(seed * 1000 + i) for i in range(offset, offset + size)]}
+
+
+class UpstreamStub:
+    '''
+    Local stand-in for the PriceRunner gateway: facet and search/category/v3 responses with a
+    fixed latency, served by a thread per connection. `requests` counts upstream calls.
+    '''
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.02):
+        stub = self
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                url = urlparse(self.path)
+                facet = re.search(r'/search/category/facets/DK/[^/]+/([^/?]+)', url.path)
+                listing = re.search(r'/search/category/v3/DK/([^/?]+)', url.path)
+                if facet:
+                    status, data = 200, _facet(facet.group(1))
+                elif listing:
+                    status, data = 200, _listing(listing.group(1), parse_qs(url.query))
+                else:
+                    status, data = 404, {"error": "not stubbed"}
+                time.sleep(stub.latency)
+                body = json.dumps(data).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}/dk/api/search-compare-gateway/public"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self) -> 'UpstreamStub':
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# --- Server under test ---
+_OLD_SERVER = '''
+import sys
+import old.api_client, old.filter_manager
+old.api_client.APIClient.BASE_SEARCH_URL = sys.argv[1] + "/search/category/v3/DK"
+old.filter_manager.FILTER_OPTIONS_BASE_URL = sys.argv[1] + "/search/category/facets/DK/{category_id}/{filter_id}?"
+from old.api_server import app
+app.run(host="127.0.0.1", port=int(sys.argv[2]), threaded=True)
+'''
+
+
+def start_old_server(upstream_url: str, port: int = 5055, timeout: float = 15.0) -> subprocess.Popen:
+    '''Runs old/api_server.py (from old/, so config.json resolves) with its upstream URLs pointed at the stub.'''
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    process = subprocess.Popen([sys.executable, '-c', _OLD_SERVER, upstream_url, str(port)], cwd=OLD_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    import requests
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"old/api_server.py exited: {process.stderr.read().decode(errors='replace')[-2000:]}")
+        try:
+            requests.get(f"http://127.0.0.1:{port}/", timeout=0.5)
+            return process
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("old/api_server.py did not start in time")
+
+
+# --- Query mix ---
+def load_categories(config_path: str = os.path.join(OLD_DIR, 'config.json')) -> Dict[str, Dict[str, Any]]:
+    with open(config_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class QueryMix:
+    '''
+    Realistic request parameters: most requests carry a Price range, many a Brand, some a
+    subcategory and a sorting preset, with list sizes as the UI uses them.
+    '''
+
+    def __init__(self, categories: Dict[str, Dict[str, Any]], seed: int = 1):
+        self.categories = categories
+        self.names = sorted(categories)
+        self.random = random.Random(seed)
+
+    def next(self) -> Tuple[str, str, Dict[str, Any]]:
+        '''(category name, category id, query parameters)'''
+        rng = self.random
+        name = rng.choice(self.names)
+        category = self.categories[name]
+        params: Dict[str, Any] = {"size": rng.choice(SIZES)}
+        if rng.random() < 0.8:
+            low = rng.choice([0, 100, 250, 500, 1000])
+            params["Price"] = f"{low}-{low + rng.choice([400, 900, 1900, 4900])}"
+        if rng.random() < 0.5:
+            params["Brand"] = rng.choice(BRANDS)
+        if rng.random() < 0.6:
+            params["sorting"] = rng.choice(SORTINGS)
+        subcategories = category.get("subcategories") or []
+        if subcategories and rng.random() < 0.3:
+            params["Subcategory"] = rng.choice(subcategories)["name"]
+        return name, str(category.get("id")), params
+
+
+# --- Load generation ---
+@dataclass
+class StepResult:
+    rate: float
+    duration: float
+    sent: int = 0
+    ok: int = 0
+    errors: int = 0
+    latencies: List[float] = field(default_factory=list)
+    upstream_requests: int = 0
+    elapsed: float = 0.0
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies:
+            return float('nan')
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    @property
+    def throughput(self) -> float:
+        return self.ok / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.sent if self.sent else 0.0
+
+    def __str__(self):
+        upstream = f"  upstream/req {self.upstream_requests / self.sent:5.1f}" if self.sent and self.upstream_requests else ""
+        return (f"rate {self.rate:7.1f}/s  sent {self.sent:6d}  ok {self.throughput:7.1f}/s  errors {self.error_rate:6.1%}  "
+                f"p50 {self.percentile(50) * 1000:7.1f} ms  p90 {self.percentile(90) * 1000:7.1f} ms  "
+                f"p99 {self.percentile(99) * 1000:7.1f} ms  max {self.percentile(100) * 1000:7.1f} ms{upstream}")
+
+
+class LoadGenerator:
+    '''Sends `rate` requests per second for `duration` seconds, open loop, from a bounded pool of client threads.'''
+
+    def __init__(self, target: str, path_template: str = '/api/category/{category}', mix: Optional[QueryMix] = None,
+                 max_in_flight: int = 256, timeout: float = 10.0, poisson: bool = False):
+        self.target = target.rstrip('/')
+        self.path_template = path_template
+        self.mix = mix or QueryMix(load_categories())
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.poisson = poisson
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            import requests
+            session = self._local.session = requests.Session()
+        return session
+
+    def _send(self, url: str, scheduled: float, result: StepResult, lock: threading.Lock):
+        try:
+            ok = self._session().get(url, timeout=self.timeout).status_code == 200
+        except Exception:
+            ok = False
+        latency = time.perf_counter() - scheduled
+        with lock:
+            result.latencies.append(latency)
+            if ok:
+                result.ok += 1
+            else:
+                result.errors += 1
+
+    def run(self, rate: float, duration: float) -> StepResult:
+        result = StepResult(rate, duration)
+        lock = threading.Lock()
+        rng = random.Random(int(rate * 1000))
+        started = time.perf_counter()
+        next_send = started
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            while next_send < started + duration:
+                delay = next_send - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                name, category_id, params = self.mix.next()
+                url = self.target + self.path_template.format(category=name, category_id=category_id) + '?' + urlencode(params)
+                executor.submit(self._send, url, next_send, result, lock)
+                result.sent += 1
+                next_send += rng.expovariate(rate) if self.poisson else 1.0 / rate
+        result.elapsed = time.perf_counter() - started
+        return result
+
+
+def saturation_point(results: List[StepResult], slo_ms: float, max_error_rate: float = 0.01) -> Optional[float]:
+    '''Highest offered rate that was fully served (>= 95% throughput) within the p99 SLO and error budget.'''
+    passing = [r.rate for r in results if r.throughput >= 0.95 * r.rate and r.percentile(99) * 1000 <= slo_ms and r.error_rate <= max_error_rate]
+    return max(passing) if passing else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load test of the category API server against a local upstream stub.")
+    parser.add_argument("--target", help="Base URL of a running server (its upstream must point at the stub URL printed here)")
+    parser.add_argument("--serve-old", action='store_true', help="Start old/api_server.py against the stub (requires flask)")
+    parser.add_argument("--path", default='/api/category/{category}', help="Route template; {category} and {category_id} are filled in")
+    parser.add_argument("--rates", default='5,10,20,40', help="Comma-separated offered request rates per second, one step each")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per step")
+    parser.add_argument("--poisson", action='store_true', help="Poisson arrivals instead of evenly spaced")
+    parser.add_argument("--max-in-flight", type=int, default=256)
+    parser.add_argument("--upstream-latency", type=float, default=20.0, help="Stub latency per upstream call in ms")
+    parser.add_argument("--stub-port", type=int, default=0)
+    parser.add_argument("--port", type=int, default=5055, help="Port for --serve-old")
+    parser.add_argument("--slo-ms", type=float, default=500.0, help="p99 latency objective used for the saturation point")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    stub = UpstreamStub(port=args.stub_port, latency=args.upstream_latency / 1000).start()
+    print(f"Upstream stub at {stub.url}", file=sys.stderr)
+    server = None
+    try:
+        if args.serve_old:
+            server = start_old_server(stub.url, args.port)
+            target = f"http://127.0.0.1:{args.port}"
+        elif args.target:
+            target = args.target
+        else:
+            parser.error("Use --target URL or --serve-old")
+        generator = LoadGenerator(target, args.path, QueryMix(load_categories(), args.seed), args.max_in_flight, poisson=args.poisson)
+        results = []
+        for rate in (float(value) for value in args.rates.split(',')):
+            upstream_before = stub.requests
+            result = generator.run(rate, args.duration)
+            result.upstream_requests = stub.requests - upstream_before
+            results.append(result)
+            print(result, flush=True)
+        point = saturation_point(results, args.slo_ms)
+        print(f"Saturation point: {f'{point:g} req/s' if point else 'below the lowest rate'} (p99 <= {args.slo_ms:g} ms, >= 95% served, <= 1% errors)")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
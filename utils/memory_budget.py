@@ -0,0 +1,143 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tracemalloc
+from typing import Optional, Dict, Any, List, Callable
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from utils.fixtures import FIXTURE_PRODUCTS, FixturePolicy, fixture_product
+
+# Budget per measurement; each runs in a fresh interpreter against replayed fixtures.
+# Budgets are ~1.5x the baseline measured with the synthetic fixtures (shown on the right),
+# so a footprint that grows by half fails the check. Re-measure and update both together.
+BUDGETS = {
+    'product_bytes': 3000,              # traced bytes per Product.from_dict              (baseline 2024)
+    'product_registry_bytes': 2150,     # same with a ProductRegistry                      (baseline 1424)
+    'cache_entry_overhead_bytes': 380,  # traced bytes per ResponseCache entry beyond body (baseline 255)
+    'pagination_peak_mb': 3.4,          # traced peak paging and decoding one subcategory  (baseline 2.27)
+    'pagination_rss_mb': 53,            # process max RSS for the same                     (baseline 35.3)
+    'tree_crawl_peak_mb': 0.56,         # traced peak walking the category tree            (baseline 0.37)
+    'tree_crawl_rss_mb': 47,            # process max RSS for the same                     (baseline 31.6)
+}
+
+
+def _fixture_products(archive_dir: Optional[str]) -> List[Dict[str, Any]]:
+    if archive_dir:
+        from transport.archive import ResponseArchive
+        products = [product for url, body in ResponseArchive(archive_dir).iter_records() if '/search/category/v3/' in url for product in json.loads(body).get("products", [])]
+        if products:
+            return products
+    return [fixture_product(i) for i in range(FIXTURE_PRODUCTS)]
+
+
+def _traced(function: Callable[[], Any]) -> tuple:
+    '''(result, bytes still allocated, peak bytes) of one call.'''
+    tracemalloc.start()
+    try:
+        result = function()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, current, peak
+
+
+def _max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _measure_products(archive_dir: Optional[str], registry: bool) -> Dict[str, float]:
+    from models.product import Product, ProductRegistry
+    products = _fixture_products(archive_dir)
+    shared = ProductRegistry() if registry else None
+    decoded, current, _ = _traced(lambda: [Product.from_dict(product, shared) for product in products])
+    return {'product_registry_bytes' if registry else 'product_bytes': current / len(decoded)}
+
+
+def _measure_cache(archive_dir: Optional[str]) -> Dict[str, float]:
+    from transport.cache import ResponseCache
+    bodies = [json.dumps(product).encode('utf-8') for product in _fixture_products(archive_dir)]
+    cache = ResponseCache(ttl=3600, max_entries=len(bodies))
+
+    def fill():
+        for i, body in enumerate(bodies):
+            cache.put(f"https://example.invalid/api/item/{i}?size=10", body)
+    _, current, _ = _traced(fill)
+    return {'cache_entry_overhead_bytes': current / len(bodies)}
+
+
+def _measure_pagination(archive_dir: Optional[str], subcategory_id: str) -> Dict[str, float]:
+    from api_client.base_layer import iter_product_pages
+    from models.product import Product
+    from transport import http_client
+    http_client.set_policy(FixturePolicy(archive_dir))
+
+    def crawl():
+        decoded = 0
+        for page in iter_product_pages(subcategory_id, 100):
+            decoded += len([Product.from_dict(product) for product in page.get("products", [])])
+        return decoded
+    _, _, peak = _traced(crawl)
+    return {'pagination_peak_mb': peak / 2 ** 20, 'pagination_rss_mb': _max_rss_mb()}
+
+
+def _measure_tree_crawl(archive_dir: Optional[str], root_id: str) -> Dict[str, float]:
+    from services.category_tree import CategoryTreeWalker
+    from transport import http_client
+    http_client.set_policy(FixturePolicy(archive_dir))
+    _, _, peak = _traced(lambda: len(CategoryTreeWalker(max_workers=8).walk([root_id])))
+    return {'tree_crawl_peak_mb': peak / 2 ** 20, 'tree_crawl_rss_mb': _max_rss_mb()}
+
+
+MEASUREMENTS = {
+    'products': lambda args: _measure_products(args.archive, registry=False),
+    'products_registry': lambda args: _measure_products(args.archive, registry=True),
+    'cache': lambda args: _measure_cache(args.archive),
+    'pagination': lambda args: _measure_pagination(args.archive, args.subcategory),
+    'tree_crawl': lambda args: _measure_tree_crawl(args.archive, args.root),
+}
+
+
+def measure(name: str, archive_dir: Optional[str] = None, subcategory: str = '40', root: str = 't1') -> Dict[str, float]:
+    '''Runs one measurement in a fresh interpreter so peaks and RSS are not shared between them.'''
+    command = [sys.executable, os.path.abspath(__file__), '--measure', name, '--subcategory', subcategory, '--root', root]
+    if archive_dir:
+        command += ['--archive', archive_dir]
+    result = subprocess.run(command, cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def check(archive_dir: Optional[str] = None, subcategory: str = '40', root: str = 't1') -> bool:
+    '''Prints a report and returns False if any measurement is over budget.'''
+    ok = True
+    for name in MEASUREMENTS:
+        for metric, value in measure(name, archive_dir, subcategory, root).items():
+            budget = BUDGETS[metric]
+            status = 'ok'
+            if value > budget:
+                status, ok = 'OVER BUDGET', False
+            print(f"{metric:28s} {value:10.1f}  (budget {budget})  {status}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check decoding, cache and crawl memory against budgets.")
+    parser.add_argument("--archive", help="ResponseArchive directory with recorded responses to replay (default: synthetic fixtures)")
+    parser.add_argument("--subcategory", default='40', help="Simple subcategory id to page through")
+    parser.add_argument("--root", default='t1', help="Root category id for the tree crawl")
+    parser.add_argument("--measure", choices=sorted(MEASUREMENTS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(MEASUREMENTS[args.measure](args)))
+        return
+    sys.exit(0 if check(args.archive, args.subcategory, args.root) else 1)
+
+
+if __name__ == "__main__":
+    main()